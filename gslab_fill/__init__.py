@@ -4,8 +4,9 @@ gslab_fill: A library for filling LyX templates with tablular data and Stata out
 
 gslab_fill provides two functions for filling LyX template files with data. 
 These are `tablefill` and `textfill`. Please see their docstrings for informations
-on their use and functionalities.
+on their use and functionalities. `tablefill_batch` and `textfill_batch` fill 
+several templates from a single parse of their input files.
 '''
 
-from tablefill import tablefill
-from textfill import textfill
+from tablefill import tablefill, tablefill_batch
+from textfill import textfill, textfill_batch
@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+
+import time
+import json
+import contextlib
+
+
+class FillResult(object):
+    '''
+    Outcome of filling one template with tablefill or textfill.
+
+    Attributes:
+        - template: the path of the template that was filled.
+        - output: the path of the filled file.
+        - status: 'success' or 'error'.
+        - message: the message printed by the fill, which is the traceback of
+            the error if status is 'error'.
+        - tables: a dictionary mapping each tag filled in the template to a
+            dictionary of counts. 'filled' is the number of entries (tablefill)
+            or lines (textfill) written to the output, 'unused' the number left
+            over in the input, and 'missing' the number of placeholders
+            (tablefill) or anchors (textfill) that had no input.
+        - timings: a dictionary mapping each phase of the fill ('index',
+            'parse', 'fill' and 'write') to its duration in seconds. Time 
+            spent in a phase timed within another, such as textfill's 'fill'
+            while its output is written, counts only towards the inner phase.
+        - skipped: the tags an incremental tablefill copied from the previous
+            output because their input entries were unchanged.
+        - truncated: a dictionary mapping each tag whose text textfill cut 
+            short (see max_lines) to the number of lines cut.
+    '''
+
+    def __init__(self, template, output, status = None, message = ''):
+        self.template  = template
+        self.output    = output
+        self.status    = status
+        self.message   = message
+        self.tables    = {}
+        self.timings   = {}
+        self.skipped   = []
+        self.truncated = {}
+        self._nested   = []
+
+    @property
+    def success(self):
+        return self.status == 'success'
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        '''Add the time spent in the body of a with statement to phase'''
+        start = time.time()
+        self._nested.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            nested  = self._nested.pop()
+            self.timings[phase] = self.timings.get(phase, 0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def count(self, tag, filled = 0, unused = 0, missing = 0):
+        counts = self.tables.setdefault(tag, {'filled': 0, 'unused': 0, 'missing': 0})
+        counts['filled']  += filled
+        counts['unused']  += unused
+        counts['missing'] += missing
+
+    def to_dict(self):
+        return {'template':  self.template,
+                'output':    self.output,
+                'status':    self.status,
+                'message':   self.message,
+                'tables':    self.tables,
+                'timings':   self.timings,
+                'skipped':   self.skipped,
+                'truncated': self.truncated}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent = 4, sort_keys = True)
+
+    def write_json(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_json())
+            f.write('\n')
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return 'FillResult(template = %r, output = %r, status = %r)' % \
+               (self.template, self.output, self.status)
@@ -5,28 +5,174 @@ import argparse
 import types
 import re
 import traceback
+import hashlib
+import tempfile
+import cPickle
+import multiprocessing
+import time
+import struct
 import tablefill_info
+from fill_result import FillResult
 from decimal import Decimal, ROUND_HALF_UP
 
+# Table headers in the input files, e.g. "<Tab:name>"
+TAB_TAG   = re.compile('^<Tab:', flags = re.IGNORECASE)
+TAB_OPEN  = re.compile('<Tab:', flags = re.IGNORECASE)
+TAB_CLOSE = re.compile('>\n')
+TAB_PREFIX = re.compile('^Tab:', flags = re.IGNORECASE)
+
+# Table anchors and placeholders in the LyX/LaTeX templates
+LYX_TABLE_TAG        = 'name "tab:'
+LATEX_TABLE_TAG      = re.compile('label{tab:')
+LATEX_TABLE_END      = re.compile('end{tabular}')
+LATEX_TAG_CHARACTERS = re.compile('[\}\"\n]')
+LITERAL_PLACEHOLDER  = '###'
+ROUND_PLACEHOLDER    = re.compile('#\d+,?#')
+COMMA_PLACEHOLDER    = re.compile('#\d+,#')
+
+# Compiled template cache. Bump the version whenever the index format changes.
+CACHE_VERSION     = '1'
+CACHE_EXTENSION   = '.tablefill_cache'
+CACHE_MAX_ENTRIES = 64
+
+# Quantizers for rounding entries, by number of decimal places
+QUANTIZERS = {}
+
+# Parsed input tables shared by the worker processes of tablefill_batch
+WORKER_TABLES = None
+
+# Binary input files (see write_binary_tables)
+BINARY_EXTENSION = '.tfb'
+BINARY_MAGIC     = 'TFB1'
+BINARY_SEPARATOR = '\0'
+
+# State kept next to the output by incremental runs. Bump the version 
+# whenever the state format changes.
+STATE_VERSION   = '1'
+STATE_EXTENSION = '.tablefill_state'
+
 
 def tablefill(**kwargs):
+    result = FillResult(kwargs.get('template'), kwargs.get('output'))
     try:
         args = parse_arguments(kwargs)
-        tables = parse_tables(args)
-        lyx_text = insert_tables(args, tables)
-        write_to_lyx(args, lyx_text)
-        exitmessage = args['template'] + ' filled successfully by tablefill'
-        print exitmessage
-        return exitmessage    
+        with result.timer('index'):
+            lyx_text, index = read_template(args)
+        with result.timer('parse'):
+            tables = parse_tables(args, template_tags(index))
+        with result.timer('fill'):
+            if args['incremental']:
+                lyx_text = fill_template_incremental(args, lyx_text, index, tables, result)
+            else:
+                lyx_text = fill_template(lyx_text, index, tables, result)
+        with result.timer('write'):
+            write_to_lyx(args, lyx_text)
+            if args['incremental']:
+                write_state(args, lyx_text, tables)
+        result.status  = 'success'
+        result.message = args['template'] + ' filled successfully by tablefill'
+        print result.message
     except:
         print 'Error Found'
-        exitmessage = traceback.format_exc()
-        print exitmessage
-        return exitmessage
+        result.status  = 'error'
+        result.message = traceback.format_exc()
+        print result.message
+    
+    if kwargs.get('json_log'):
+        result.write_json(kwargs['json_log'])
+    if kwargs.get('return_result'):
+        return result
+    return result.message
 
 # Set tablefill's docstring as the text in "tablefill_info.py"
 tablefill.__doc__ = tablefill_info.__doc__   
 
+def tablefill_batch(input, templates, processes = None, cache_dir = None):
+    '''
+    Fill many templates from a single parse of the input files.
+
+    input is a space-delimited string of input files, as in tablefill, and 
+    templates is a list of (template, output) pairs. The templates are filled 
+    concurrently by a pool of `processes` worker processes (by default one per 
+    CPU); `processes = 1` fills them in the current process. If cache_dir is 
+    given, indexed templates are cached there as in tablefill.
+
+    Returns a list of FillResult objects in the order of templates.
+    '''
+    results = [None] * len(templates)
+    jobs = []
+    tags = set()
+    for n, (template, output) in enumerate(templates):
+        result = FillResult(template, output)
+        try:
+            with result.timer('index'):
+                lyx_text, index = read_template({'template': template, 'cache_dir': cache_dir})
+            jobs.append((n, result, lyx_text, index))
+            tags.update(template_tags(index))
+        except:
+            result.status  = 'error'
+            result.message = traceback.format_exc()
+            results[n] = result
+    
+    start = time.time()
+    try:
+        tables = parse_tables({'input': input.split()}, tags)
+    except:
+        exitmessage = traceback.format_exc()
+        for n, result, lyx_text, index in jobs:
+            result.status  = 'error'
+            result.message = exitmessage
+            results[n] = result
+        jobs = []
+    for n, result, lyx_text, index in jobs:
+        result.timings['parse'] = time.time() - start
+    
+    if processes == 1 or len(jobs) <= 1:
+        filled = [fill_template_file(job, tables) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(processes, init_worker, (tables, ))
+        try:
+            filled = pool.map(fill_template_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    for job, result in zip(jobs, filled):
+        results[job[0]] = result
+    
+    for result in results:
+        if not result.success:
+            print 'Error Found'
+        print result.message
+    
+    return results
+
+
+def init_worker(tables):
+    '''Store the parsed tables once in each worker process of tablefill_batch'''
+    global WORKER_TABLES
+    WORKER_TABLES = tables
+
+
+def fill_template_job(job):
+    return fill_template_file(job, WORKER_TABLES)
+
+
+def fill_template_file(job, tables):
+    n, result, lyx_text, index = job
+    try:
+        with result.timer('fill'):
+            lyx_text = fill_template(lyx_text, index, tables, result)
+        with result.timer('write'):
+            write_to_lyx({'output': result.output}, lyx_text)
+        result.status  = 'success'
+        result.message = result.template + ' filled successfully by tablefill'
+    except:
+        result.status  = 'error'
+        result.message = traceback.format_exc()
+    
+    return result
+
+
 def parse_arguments(kwargs):
     args = dict()
     if 'input' in kwargs.keys():
@@ -36,47 +182,151 @@ def parse_arguments(kwargs):
         args['template'] = kwargs['template']
     if 'output' in kwargs.keys():
         args['output'] = kwargs['output']        
+    if 'cache_dir' in kwargs.keys():
+        args['cache_dir'] = kwargs['cache_dir']
+    else:
+        args['cache_dir'] = None
+    if 'incremental' in kwargs.keys():
+        args['incremental'] = kwargs['incremental']
+    else:
+        args['incremental'] = False
     
     return args
 
 
-def parse_tables(args):
-    data   = read_data(args['input'])
-    tables = parse_data(data)
+def parse_tables(args, tags = None):
+    tables = {}
+    text_input = []
+    for file in args['input'] + [None]:
+        if file is not None and not file.endswith(BINARY_EXTENSION):
+            text_input.append(file)
+            continue
+        # Consecutive text files are parsed as one stream
+        if text_input:
+            data = read_data(text_input)
+            tables.update(parse_data(data, tags))
+            text_input = []
+        if file is not None:
+            tables.update(read_binary_tables(file, tags))
     
     return tables
 
 
 def read_data(input):
-    data = []
+    '''
+    Iterate lazily over the lines of the input files, so that the files 
+    are never held in memory.
+    '''
     if isinstance(input, types.StringTypes):
         input = [input]
     for file in input:
-        data += open(file, 'rU').readlines()
+        with open(file, 'rU') as f:
+            for line in f:
+                yield line
+
+
+def read_binary_tables(file, tags = None):
+    '''
+    Read the tables of a binary input file written by write_binary_tables. 
+    If tags is given, only the tables with these (lower-case) tags are read; 
+    the others are skipped without being loaded.
+    '''
+    tables = {}
+    with open(file, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError('%s is not a tablefill binary file' % file)
+        while True:
+            header = f.read(4)
+            if not header:
+                break
+            tag = f.read(struct.unpack('<I', header)[0]).lower()
+            n_entries, data_size = struct.unpack('<IQ', f.read(12))
+            if tags is not None and tag not in tags:
+                f.seek(data_size, 1)
+                continue
+            
+            data = f.read(data_size)
+            entries = data.split(BINARY_SEPARATOR) if n_entries else []
+            if len(entries) != n_entries:
+                raise ValueError('Table %s in %s has %d entries, expected %d' % \
+                                 (tag, file, len(entries), n_entries))
+            tables[tag] = entries
     
-    return data
+    return tables
+
+
+def write_binary_tables(tables, file):
+    '''
+    Write tables to a binary input file for tablefill, which reads it without 
+    any parsing. tables is a dictionary or a list of (tag, entries) pairs, 
+    where tag is the table's label (with or without 'tab:') and entries is
+    the list of the table's entries. Entries are cleaned as in text input
+    files: missing entries ('.' or blank) are dropped.
+
+    The file starts with the four bytes 'TFB1'. Each table then follows as:
+        - the length of its tag (unsigned 4-byte integer) and the tag itself.
+        - the number of entries (unsigned 4-byte integer) and the length of 
+            the entries (unsigned 8-byte integer).
+        - the entries, separated by null bytes.
+    All integers are little-endian.
+    '''
+    if isinstance(tables, dict):
+        tables = tables.items()
+    with open(file, 'wb') as f:
+        f.write(BINARY_MAGIC)
+        for tag, entries in tables:
+            tag = TAB_PREFIX.sub('', encode_binary(tag)).lower()
+            entries = [encode_binary(entry).strip() for entry in entries]
+            entries = [entry for entry in entries if entry != '.' and entry != '']
+            data = BINARY_SEPARATOR.join(entries)
+            if data.count(BINARY_SEPARATOR) != max(len(entries) - 1, 0):
+                raise ValueError('Entries of table %s contain null bytes' % tag)
+            f.write(struct.pack('<I', len(tag)) + tag)
+            f.write(struct.pack('<IQ', len(entries), len(data)))
+            f.write(data)
+
 
+def encode_binary(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
 
-def parse_data(data):
+
+def parse_data(data, tags = None):
+    '''
+    Parse the rows of the input files into a dictionary mapping each 
+    (lower-case) table tag to its entries. If tags is given, only the tables 
+    with these tags are kept; the rows of other tables are skipped unsplit.
+    '''
     tables = {}
     for row in data:
-        if re.match('^<Tab:', row, flags = re.IGNORECASE):
-            tag = re.sub('<Tab:', '', row, flags = re.IGNORECASE)
-            tag = re.sub('>\n', '', tag, flags = re.IGNORECASE)
+        if TAB_TAG.match(row):
+            tag = TAB_OPEN.sub('', row)
+            tag = TAB_CLOSE.sub('', tag)
             tag = tag.lower()
-            tables[tag] = []
-        else:
-            clean_row = row.strip()
-            tables[tag] = tables[tag] + clean_row.split('\t')
-    for table_tag in tables:
-        for n in range( len(tables[table_tag]) ):
-            clean_entry = tables[table_tag][n].strip()
-            tables[table_tag][n] = clean_entry
-        tables[table_tag] = filter(lambda a: a != '.' and a != '', tables[table_tag])
+            if tags is None or tag in tags:
+                tables[tag] = []
+                table = tables[tag]
+            else:
+                table = None
+        elif table is not None:
+            for entry in row.strip().split('\t'):
+                entry = entry.strip()
+                if entry != '.' and entry != '':
+                    table.append(entry)
         
     return tables    
     
 
+def read_template(args):
+    if re.search('\.lyx', args['template']):
+        return load_template(args['template'], 'lyx', args.get('cache_dir'))
+    elif re.search('\.tex', args['template']):
+        return load_template(args['template'], 'tex', args.get('cache_dir'))
+
+def template_tags(index):
+    return set(tag for tag, slots, closed in index)
+
 def insert_tables(args, tables):
     if re.search('\.lyx', args['template']):
         return insert_tables_lyx(args, tables)
@@ -84,93 +334,342 @@ def insert_tables(args, tables):
         return insert_tables_latex(args, tables)
 
 def insert_tables_lyx(args, tables):
-    lyx_text = open(args['template'], 'rU').readlines()
-    for n in range( len(lyx_text) ):
-        if lyx_text[n].startswith('name "tab:'):
-            tag = lyx_text[n].replace('name "tab:','').rstrip('"\n').lower()
-            if tag in tables:
-                i = n
-                entry_count = 0
-                search_table = True
-            
-                while search_table is True:
-                    i+=1
-                    if re.match('^.*###', lyx_text[i]):
-                        lyx_text[i] = lyx_text[i].replace('###', tables[tag][entry_count])
-                        entry_count+=1
-                
-                    elif re.match('^.*#\d+#', lyx_text[i]) or re.match('^.*#\d+,#', lyx_text[i]):
-                        entry_tag = re.split('#', lyx_text[i])[1]
-                        if re.match('---', tables[tag][entry_count]):
-                            rounded_entry = '---'
-                        else:
-                            rounded_entry = round_entry(entry_tag, tables[tag][entry_count])
-                            if re.match('^.*#\d+,#', lyx_text[i]):
-                                rounded_entry = insert_commas(rounded_entry)
-                        lyx_text[i] = lyx_text[i].replace('#' + entry_tag + '#', rounded_entry)
-                        entry_count+=1
-                
-                    elif lyx_text[i] == '</lyxtabular>\n':
-                        search_table = False
-    return lyx_text
+    lyx_text, index = load_template(args['template'], 'lyx', args.get('cache_dir'))
+    return fill_template(lyx_text, index, tables)
 
 def insert_tables_latex(args, tables):
-    lyx_text = open(args['template'], 'rU').readlines()
+    lyx_text, index = load_template(args['template'], 'tex', args.get('cache_dir'))
+    return fill_template(lyx_text, index, tables)
+
+def load_template(template, template_type, cache_dir = None):
+    '''
+    Return the lines of the template and their index from index_template.
+    If cache_dir is given, the pair is stored there under the hash of the 
+    template's content and reused as long as the template is unchanged.
+    '''
+    if not cache_dir:
+        lyx_text = open(template, 'rU').readlines()
+        return lyx_text, index_template(lyx_text, template_type)
+    
+    with open(template, 'rb') as f:
+        template_hash = hashlib.md5(f.read()).hexdigest()
+    cache_name = '%s_%s_v%s%s' % (template_hash, template_type, 
+                                  CACHE_VERSION, CACHE_EXTENSION)
+    cache_file = os.path.join(cache_dir, cache_name)
+    
+    if os.path.isfile(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                lyx_text, index = cPickle.load(f)
+            os.utime(cache_file, None)
+            return lyx_text, index
+        except Exception:
+            # A corrupt entry is rebuilt below
+            pass
+    
+    lyx_text = open(template, 'rU').readlines()
+    index = index_template(lyx_text, template_type)
+    write_template_cache(cache_dir, cache_file, (lyx_text, index))
+    
+    return lyx_text, index
+
+def write_template_cache(cache_dir, cache_file, compiled_template):
+    '''
+    Write a compiled template to the cache, then evict the least recently 
+    used entries beyond CACHE_MAX_ENTRIES.
+    '''
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    
+    # Write to a temporary file first so that concurrent runs never read 
+    # a partially written entry
+    handle, temp_file = tempfile.mkstemp(dir = cache_dir)
+    with os.fdopen(handle, 'wb') as f:
+        cPickle.dump(compiled_template, f, cPickle.HIGHEST_PROTOCOL)
+    try:
+        os.rename(temp_file, cache_file)
+    except OSError:
+        # Windows does not allow renaming onto an existing file
+        os.remove(cache_file)
+        os.rename(temp_file, cache_file)
+    
+    # Eviction is best effort, as concurrent runs sharing cache_dir may 
+    # remove entries at the same time
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_EXTENSION):
+            entry = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(entry), entry))
+            except OSError:
+                pass
+    entries.sort(reverse = True)
+    for modified, entry in entries[CACHE_MAX_ENTRIES:]:
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
+
+def index_template(lyx_text, template_type):
+    '''
+    Record every table anchor of a LyX (template_type = 'lyx') or LaTeX 
+    (template_type = 'tex') template, and the position of every placeholder 
+    in the table that follows it, in a single pass over the template lines.
+
+    Returns a list of (tag, slots, closed) tuples in template order, where 
+    closed is False if the end of the table was never found. Each slot is a 
+    (line, column, entry_tag, comma) tuple: column is the position of the 
+    "&"-delimited cell in LaTeX templates and None in LyX templates, entry_tag 
+    is None for "###" and the rounding tag (e.g. '3,') for "#3,#", and comma 
+    is True if commas should be inserted in the filled entry.
+    '''
+    index = []
+    open_tables = []
     for n in range( len(lyx_text) ):
-        if re.search('label{tab:', lyx_text[n]):
-            tag = re.sub("[\}\"\n]", "", lyx_text[n].split(':')[1]).lower()
-            if tag in tables:
-                i = n
-                entry_count = 0
-                search_table = True
-                
-                while search_table is True:
-                    i+=1
-                    lyx_text_i = lyx_text[i].split("&")
-                    for col in range(len(lyx_text_i)):
-                        if re.match('^.*###', lyx_text_i[col]):
-                            lyx_text_i[col] = lyx_text_i[col].replace('###', tables[tag][entry_count])
-                            entry_count+=1
-                    
-                        elif re.match('^.*#\d+#', lyx_text_i[col]) or re.match('^.*#\d+,#', lyx_text_i[col]):
-                            entry_tag = re.split('#', lyx_text_i[col])[1]
-                            if re.match('---', tables[tag][entry_count]):
-                                rounded_entry = '---'
-                            else:
-                                rounded_entry = round_entry(entry_tag, tables[tag][entry_count])
-                                if re.match('^.*#\d+,#', lyx_text_i[col]):
-                                    rounded_entry = insert_commas(rounded_entry)
-                            lyx_text_i[col] = lyx_text_i[col].replace('#' + entry_tag + '#', rounded_entry)
-                            entry_count+=1
-                    
-                    lyx_text[i] = "&".join(lyx_text_i)
-                    if re.search('end{tabular}', lyx_text[i]):
-                        search_table = False
+        line = lyx_text[n]
+        if open_tables:
+            if template_type == 'lyx':
+                slots = [index_placeholder(n, None, line)]
+                end_table = (line == '</lyxtabular>\n')
+            else:
+                slots = [index_placeholder(n, col, cell) 
+                         for col, cell in enumerate(line.split('&'))]
+                end_table = LATEX_TABLE_END.search(line)
+            slots = [slot for slot in slots if slot]
+            for table_slots in open_tables:
+                table_slots.extend(slots)
+            if end_table:
+                for table in index[-len(open_tables):]:
+                    table[2] = True
+                open_tables = []
+        
+        tag = index_anchor(line, template_type)
+        if tag is not None:
+            index.append([tag, [], False])
+            open_tables.append(index[-1][1])
+    
+    return [tuple(table) for table in index]
+
+def index_anchor(line, template_type):
+    if template_type == 'lyx' and line.startswith(LYX_TABLE_TAG):
+        return line.replace(LYX_TABLE_TAG, '').rstrip('"\n').lower()
+    elif template_type == 'tex' and LATEX_TABLE_TAG.search(line):
+        return LATEX_TAG_CHARACTERS.sub('', line.split(':')[1]).lower()
+
+def index_placeholder(line_number, col, text):
+    if LITERAL_PLACEHOLDER in text:
+        return (line_number, col, None, False)
+    elif ROUND_PLACEHOLDER.search(text):
+        entry_tag = text.split('#')[1]
+        comma = bool(COMMA_PLACEHOLDER.search(text))
+        return (line_number, col, entry_tag, comma)
+
+def fill_template(lyx_text, index, tables, result = None):
+    '''
+    Write the entries of each table in tables to the placeholder slots 
+    recorded by index_template. Modifies and returns lyx_text. If a 
+    FillResult is given, the entries filled, unused and missing for each 
+    table are counted in it.
+    '''
+    cells = {}
+    filled = set()
+    for tag, slots, closed in index:
+        if tag not in tables:
+            if result is not None:
+                result.count(tag, missing = len(slots))
+            continue
+        table_slots = []
+        for slot in slots:
+            n, col = slot[:2]
+            if col is not None and n not in cells:
+                cells[n] = lyx_text[n].split('&')
+            # A slot shared by two anchors may already have been filled
+            if (n, col) in filled:
+                text = lyx_text[n] if col is None else cells[n][col]
+                slot = index_placeholder(n, col, text)
+                if slot is None:
+                    continue
+            table_slots.append(slot)
+        
+        if result is not None:
+            count_entries(result, tag, len(tables[tag]), len(table_slots))
+        specs = [(entry_tag, comma) for n, col, entry_tag, comma in table_slots]
+        entries = format_entries(tables[tag], specs)
+        for (n, col, entry_tag, comma), entry in zip(table_slots, entries):
+            placeholder = LITERAL_PLACEHOLDER if entry_tag is None else '#' + entry_tag + '#'
+            if col is None:
+                lyx_text[n] = lyx_text[n].replace(placeholder, entry)
+            else:
+                cells[n][col] = cells[n][col].replace(placeholder, entry)
+            filled.add((n, col))
+        if not closed:
+            raise IndexError('The end of table %s was not found in the template' % tag)
+    
+    for n in cells:
+        lyx_text[n] = '&'.join(cells[n])
+    
     return lyx_text
 
+def count_entries(result, tag, n_entries, n_slots):
+    result.count(tag, filled  = min(n_entries, n_slots),
+                      unused  = max(n_entries - n_slots, 0),
+                      missing = max(n_slots - n_entries, 0))
+
+def fill_template_incremental(args, lyx_text, index, tables, result = None):
+    '''
+    Fill only the tables whose entries changed since the last incremental run 
+    on args['output'], and copy the other tables from the previous output. 
+    Falls back to filling every table if the template or the previous output 
+    changed since that run. The tags that were copied are listed in 
+    result.skipped.
+    '''
+    state = read_state(args)
+    with open(args['template'], 'rb') as f:
+        template_hash = hashlib.md5(f.read()).hexdigest()
+    if state is None or state['template_hash'] != template_hash:
+        return fill_template(lyx_text, index, tables, result)
+    
+    with open(args['output'], 'rb') as f:
+        previous_output = f.read()
+    previous_text = previous_output.split('\n')
+    previous_text = [line + '\n' for line in previous_text[:-1]] + previous_text[-1:]
+    if previous_text[-1] == '':
+        del previous_text[-1]
+    if hashlib.md5(previous_output).hexdigest() != state['output_hash'] or \
+       len(previous_text) != len(lyx_text):
+        return fill_template(lyx_text, index, tables, result)
+    
+    # Tables that share a line with a changed table are filled again too
+    skipped = set(tag for tag in tables 
+                  if state['digests'].get(tag) == table_digest(tables[tag]))
+    line_tags = {}
+    for tag, slots, closed in index:
+        for slot in slots:
+            line_tags.setdefault(slot[0], set()).add(tag)
+    shared = True
+    while shared:
+        shared = False
+        for tags in line_tags.values():
+            if tags & skipped and not tags <= skipped:
+                skipped -= tags
+                shared = True
+    
+    changed_index = []
+    for tag, slots, closed in index:
+        if tag not in skipped:
+            changed_index.append((tag, slots, closed))
+            continue
+        for slot in slots:
+            lyx_text[slot[0]] = previous_text[slot[0]]
+        if result is not None:
+            count_entries(result, tag, len(tables[tag]), len(slots))
+    if result is not None:
+        result.skipped = sorted(skipped)
+    
+    return fill_template(lyx_text, changed_index, tables, result)
+
+def table_digest(entries):
+    return hashlib.md5('\t'.join(entries)).hexdigest()
+
+def read_state(args):
+    state_file = args['output'] + STATE_EXTENSION
+    if not os.path.isfile(state_file) or not os.path.isfile(args['output']):
+        return None
+    try:
+        with open(state_file, 'rb') as f:
+            state = cPickle.load(f)
+    except Exception:
+        return None
+    if state.get('version') != STATE_VERSION:
+        return None
+    
+    return state
+
+def write_state(args, lyx_text, tables):
+    with open(args['template'], 'rb') as f:
+        template_hash = hashlib.md5(f.read()).hexdigest()
+    state = {'version':       STATE_VERSION,
+             'template_hash': template_hash,
+             'output_hash':   hashlib.md5(''.join(lyx_text)).hexdigest(),
+             'digests':       dict((tag, table_digest(tables[tag])) for tag in tables)}
+    with open(args['output'] + STATE_EXTENSION, 'wb') as f:
+        cPickle.dump(state, f, cPickle.HIGHEST_PROTOCOL)
+
+def format_entries(entries, specs):
+    '''
+    Format the entries of a table for its placeholders, where specs is a list
+    of (entry_tag, comma) pairs as recorded by index_template. Entries are 
+    rounded in one pass per precision, so each quantizer is built only once.
+    Raises an IndexError if there are fewer entries than placeholders.
+    '''
+    formatted = list(entries[:len(specs)])
+    try:
+        precisions = {}
+        for n in range( len(formatted) ):
+            entry_tag = specs[n][0]
+            if entry_tag is None:
+                continue
+            elif formatted[n].startswith('---'):
+                formatted[n] = '---'
+            else:
+                round_to = int(entry_tag.replace(',', ''))
+                precisions.setdefault(round_to, []).append(n)
+        
+        for round_to in sorted(precisions):
+            quantizer = get_quantizer(round_to)
+            for n in precisions[round_to]:
+                rounded_entry = str(Decimal(formatted[n]).quantize(quantizer, rounding = ROUND_HALF_UP))
+                if specs[n][1]:
+                    rounded_entry = insert_commas(rounded_entry)
+                formatted[n] = rounded_entry
+    except (ValueError, ArithmeticError):
+        # Raise the error of the first entry that cannot be formatted
+        for n in range( len(formatted) ):
+            format_entry(specs[n][0], specs[n][1], entries[n])
+        raise
+    
+    if len(entries) < len(specs):
+        raise IndexError('The template has %d placeholders for a table with %d entries' 
+                         % (len(specs), len(entries)))
+    
+    return formatted
+
+def format_entry(entry_tag, comma, entry):
+    if entry_tag is None:
+        return entry
+    elif entry.startswith('---'):
+        return '---'
+    
+    rounded_entry = round_entry(entry_tag, entry)
+    if comma:
+        rounded_entry = insert_commas(rounded_entry)
+    
+    return rounded_entry
+
+def get_quantizer(round_to):
+    if round_to not in QUANTIZERS:
+        decimal_place = round(pow(0.1, round_to), round_to)
+        if round_to == 0:
+            decimal_place = str(int(decimal_place))
+        else:
+            decimal_place = str(decimal_place)
+        QUANTIZERS[round_to] = Decimal(decimal_place)
+    
+    return QUANTIZERS[round_to]
+
 def round_entry(entry_tag, entry):
     round_to = int(entry_tag.replace(',', ''))
-    decimal_place = round(pow(0.1, round_to), round_to)
-    if round_to == 0:
-        decimal_place = str(int(decimal_place))
-    else:
-        decimal_place = str(decimal_place)
-    rounded_entry = str(Decimal(entry).quantize(Decimal(decimal_place), rounding = ROUND_HALF_UP))
+    rounded_entry = str(Decimal(entry).quantize(get_quantizer(round_to), rounding = ROUND_HALF_UP))
 
     return rounded_entry
 
 
 def insert_commas(entry):
-    integer_part = re.split('\.', entry)[0]
-    integer_part = format(int(integer_part), ',d')
-    
-    if re.search('\.', entry):
-        decimal_part = re.split('\.', entry)[1]
-        entry_commas = integer_part + '.' + decimal_part 
-    else:
-        entry_commas = integer_part
+    integer_part, point, decimal_part = entry.partition('.')
+    entry_commas = format(int(integer_part), ',d') + point + decimal_part
 
-    if float(entry) < 0 and entry_commas[0] != '-':
+    # Entries between -1 and 0 lose their sign when the integer part is formatted
+    if entry_commas[0] != '-' and entry[0] == '-' and float(entry) < 0:
         entry_commas = '-' + entry_commas
     
     return entry_commas
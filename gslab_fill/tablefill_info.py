@@ -98,6 +98,25 @@ Examples:
 -0.922e+3
 ```
 
+................................
+ Binary Input Files:
+................................
+Input files ending in .tfb are read as binary input files rather than as text.
+They hold the same tables as text input files but are read without splitting
+and cleaning every row, which saves time when the input is large. Binary and
+text input files can be mixed in the input argument.
+
+Binary input files are written from Python with write_binary_tables:
+
+```
+from gslab_fill.tablefill import write_binary_tables
+
+write_binary_tables([('tab:Test', ['1', '2', '3'])], 'tables.tfb')
+```
+
+The layout of the file is documented in write_binary_tables, so that it can
+also be written directly by other programs.
+
 ###########################
 Template LyX Format:
 ###########################
@@ -287,6 +306,62 @@ If a row in the template has no substitutions, then it's not really a row from
 the program's point of view.
 
 
+######################
+# Template Cache
+######################
+
+Indexing a large template (finding every table and every placeholder in it) 
+can take a substantial share of a tablefill call. If the same template is 
+filled repeatedly, a directory can be given in which tablefill caches the 
+indexed template:
+
+```
+tablefill(input = 'input_file(s)', template = 'template_file', 
+          output = 'output_file', cache_dir = 'cache_directory')
+```
+
+Cached templates are keyed by a hash of the template's content, so an edited 
+template is indexed afresh. Only the most recently used templates are kept.
+
+
+######################
+# Incremental Filling
+######################
+
+With `incremental = True`, tablefill keeps a record of each table's entries 
+next to the output file (as output_file.tablefill_state). On the next 
+incremental run, only the tables whose entries changed are filled again; the 
+others are copied from the previous output. The output is identical to that 
+of a full run. If the template or the previous output changed in between, 
+every table is filled. With `return_result = True`, the tags that were 
+copied are listed in the result's `skipped` attribute.
+
+
+######################
+# Filling Many Templates
+######################
+
+When several templates are filled from the same input files, 
+`tablefill_batch` parses the input files once and fills the templates 
+concurrently in a pool of worker processes:
+
+```
+from gslab_fill.tablefill import tablefill_batch
+
+results = tablefill_batch(input = 'input_file(s)', 
+                          templates = [('template_1.lyx', 'output_1.lyx'),
+                                       ('template_2.tex', 'output_2.tex')],
+                          processes = 4)
+```
+
+The optional arguments are `processes`, the number of worker processes (by 
+default, one per CPU), and `cache_dir`, as above. It returns one result per 
+template, in order. Each result has the attributes `template`, `output`, 
+`status` ('success' or 'error'), `success` (True or False), and `message` 
+(the message tablefill would have returned). On Windows, scripts that call 
+`tablefill_batch` must do so under an `if __name__ == '__main__':` guard.
+
+
 ######################
 # Error Logging
 ######################
@@ -304,6 +379,21 @@ exitmessage = tablefill( input = 'input_file(s)', template = 'template_file',
 Lines can then be added to make.py to output this string to a log file using 
 standard Python and built in gslab_make commands.
 
+With `return_result = True`, tablefill instead returns a result object with 
+the attributes `status` ('success' or 'error'), `success` (True or False), 
+`message` (the string above), `tables` and `timings`. `tables` maps each tag 
+in the template to the number of entries 'filled', the number of input entries 
+left 'unused', and the number of placeholders 'missing' an input entry. 
+`timings` gives the seconds spent in each phase: 'index' (reading the 
+template), 'parse' (reading the input files), 'fill' and 'write'. Passing 
+`json_log = 'log_file'` writes the same information to log_file as JSON:
+
+```
+result = tablefill( input = 'input_file(s)', template = 'template_file', 
+                    output = 'output_file', return_result = True,
+                    json_log = 'tablefill.json' )
+```
+
 
 ######################
 # Common Errors
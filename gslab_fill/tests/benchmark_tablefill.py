@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+'''
+Benchmarks for `gslab_fill.tablefill`. Run with
+`python benchmark_tablefill.py`
+from `gslab_fill/tests/`.
+'''
+
+import sys
+import os
+import re
+import random
+import timeit
+from decimal import Decimal, ROUND_HALF_UP
+
+sys.path.append('../..')
+
+from gslab_fill.tablefill import parse_data, format_entries, \
+                                 read_binary_tables, write_binary_tables
+
+
+def make_data(n_cells, n_cols = 10):
+    '''Build the rows of an input file holding a single table of n_cells cells'''
+    data = ['<Tab:Benchmark>\n']
+    row  = '\t'.join(['%d.1234' % col for col in range(n_cols)]) + '\n'
+    data += [row] * (n_cells // n_cols)
+    return data
+
+
+def parse_data_quadratic(data):
+    '''The original parser, which copies the table list on every row'''
+    tables = {}
+    for row in data:
+        if row.startswith('<Tab:'):
+            tag = row[5:-2].lower()
+            tables[tag] = []
+        else:
+            tables[tag] = tables[tag] + row.strip().split('\t')
+    return tables
+
+
+def benchmark_parse_data(sizes = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6],
+                         max_quadratic = 10 ** 5):
+    print 'parse_data: seconds per table'
+    print '%10s %12s %12s' % ('cells', 'linear', 'quadratic')
+    for n_cells in sizes:
+        data   = make_data(n_cells)
+        linear = min(timeit.repeat(lambda: parse_data(data), number = 1, repeat = 3))
+        if n_cells <= max_quadratic:
+            quadratic = '%12.4f' % min(timeit.repeat(lambda: parse_data_quadratic(data),
+                                                     number = 1, repeat = 3))
+        else:
+            quadratic = '%12s' % '-'
+        print '%10d %12.4f %s' % (n_cells, linear, quadratic)
+
+
+def benchmark_binary_input(sizes = [10 ** 4, 10 ** 5, 10 ** 6]):
+    print 'read_binary_tables: seconds per table'
+    print '%10s %12s %12s' % ('cells', 'text', 'binary')
+    if not os.path.exists('./build/'):
+        os.mkdir('./build/')
+    for n_cells in sizes:
+        data = make_data(n_cells)
+        with open('./build/benchmark.txt', 'wb') as f:
+            f.writelines(data)
+        write_binary_tables(parse_data(data), './build/benchmark.tfb')
+        
+        def read_text():
+            with open('./build/benchmark.txt', 'rU') as f:
+                return parse_data(f)
+        text   = min(timeit.repeat(read_text, number = 1, repeat = 3))
+        binary = min(timeit.repeat(lambda: read_binary_tables('./build/benchmark.tfb'),
+                                   number = 1, repeat = 3))
+        print '%10d %12.4f %12.4f' % (n_cells, text, binary)
+
+
+def format_entries_per_cell(entries, specs):
+    '''The original formatting path, which builds a quantizer for every cell'''
+    formatted = []
+    for entry, (entry_tag, comma) in zip(entries, specs):
+        round_to = int(entry_tag.replace(',', ''))
+        decimal_place = round(pow(0.1, round_to), round_to)
+        if round_to == 0:
+            decimal_place = str(int(decimal_place))
+        else:
+            decimal_place = str(decimal_place)
+        entry = str(Decimal(entry).quantize(Decimal(decimal_place), rounding = ROUND_HALF_UP))
+        if comma:
+            integer_part = format(int(re.split('\.', entry)[0]), ',d')
+            if re.search('\.', entry):
+                entry_commas = integer_part + '.' + re.split('\.', entry)[1]
+            else:
+                entry_commas = integer_part
+            if float(entry) < 0 and entry_commas[0] != '-':
+                entry_commas = '-' + entry_commas
+            entry = entry_commas
+        formatted.append(entry)
+    return formatted
+
+
+def benchmark_format_entries(n_cells = 10 ** 5):
+    random.seed(0)
+    entries = ['%.6f' % random.uniform(-10 ** 6, 10 ** 6) for n in range(n_cells)]
+    specs   = [random.choice([('2', False), ('3', False), ('0,', True), ('2,', True)]) 
+               for n in range(n_cells)]
+    assert format_entries(entries, specs) == format_entries_per_cell(entries, specs)
+    
+    per_cell = min(timeit.repeat(lambda: format_entries_per_cell(entries, specs), 
+                                 number = 1, repeat = 3))
+    batch    = min(timeit.repeat(lambda: format_entries(entries, specs), 
+                                 number = 1, repeat = 3))
+    print 'format_entries: seconds for %d cells' % n_cells
+    print '%12s %12s' % ('per cell', 'batch')
+    print '%12.4f %12.4f' % (per_cell, batch)
+
+
+if __name__ == '__main__':
+    benchmark_parse_data()
+    benchmark_binary_input()
+    benchmark_format_entries()
@@ -0,0 +1,206 @@
+#! /usr/bin/env python
+'''
+Benchmarks for `gslab_fill.textfill`. Run with
+`python benchmark_textfill.py`
+from `gslab_fill/tests/`.
+'''
+
+import sys
+import os
+import timeit
+
+sys.path.append('../..')
+
+from HTMLParser import HTMLParser
+from gslab_fill.textfill import (textfill, textfill_batch, fill_text, read_text, 
+                                 write_data_to_lyx, iter_data_to_lyx)
+from gslab_make.tests import nostderrout
+
+
+class Text(object):
+    def __init__(self, results):
+        self.results = results
+
+
+def make_template(n_anchors, lines_between = 200):
+    '''Build a LyX template with n_anchors text anchors, one per layout'''
+    filler = ['\\begin_layout Standard\n', 'Some text\n', '\\end_layout\n'] * \
+             (lines_between // 3)
+    lyx_text = ['#LyX 2.0 created this file.\n']
+    for n in range(n_anchors):
+        lyx_text += filler
+        lyx_text += ['\\begin_layout Standard\n',
+                     '\\begin_inset CommandInset label\n',
+                     'name "text:anchor%d"\n' % n,
+                     '\\end_inset\n',
+                     '\\end_layout\n']
+    return lyx_text
+
+
+def make_text(n_anchors, n_lines = 50):
+    lines = '\n'.join(['. display %d' % line for line in range(n_lines)])
+    return Text(dict(('anchor%d' % n, lines) for n in range(n_anchors)))
+
+
+def fill_text_quadratic(args, text):
+    '''The original engine, which inserts into the template list while scanning it'''
+    lyx_text = open(args['template'], 'rU').readlines()
+    n = 0
+    while n + 1 < len(lyx_text):
+        n += 1
+        if lyx_text[n].startswith('name "text:'):
+            tag = lyx_text[n].replace('name "text:', '', 1).rstrip('"\n').lower()
+            if tag in text.results:
+                i = n + 1
+                while lyx_text[i] != '\\end_layout\n':
+                    i += 1
+                for key in text.results:
+                    if tag == key:
+                        lyx_code = write_data_to_lyx(text.results[key], args['size'])
+                lyx_text.insert(i + 1, lyx_code)
+    return lyx_text
+
+
+def benchmark_fill_text(sizes = [100, 300, 1000, 3000]):
+    if not os.path.exists('./build/'):
+        os.mkdir('./build/')
+    print 'fill_text: seconds per template'
+    print '%10s %12s %12s %12s' % ('anchors', 'lines', 'linear', 'quadratic')
+    for n_anchors in sizes:
+        lyx_text = make_template(n_anchors)
+        text     = make_text(n_anchors)
+        with open('./build/benchmark_template.lyx', 'wb') as f:
+            f.writelines(lyx_text)
+        args = {'template': './build/benchmark_template.lyx', 'size': 'Default'}
+        assert ''.join(fill_text(args, text)) == ''.join(fill_text_quadratic(args, text))
+
+        linear    = min(timeit.repeat(lambda: list(fill_text(args, text)),
+                                      number = 1, repeat = 3))
+        quadratic = min(timeit.repeat(lambda: fill_text_quadratic(args, text),
+                                      number = 1, repeat = 3))
+        print '%10d %12d %12.4f %12.4f' % (n_anchors, len(lyx_text), linear, quadratic)
+
+
+class text_parser_concatenating(HTMLParser):
+    '''The original parser, which grows each block by string concatenation'''
+    def __init__(self, prefix):
+        HTMLParser.__init__(self)
+        self.results = {}
+        self.open = []
+        self.prefix = prefix
+    
+    def handle_starttag(self, tag, attrs):
+        if tag.startswith(self.prefix):
+            self.results[tag.replace(self.prefix, '', 1)] = ''
+            self.open.append(tag.replace(self.prefix, '', 1))
+    
+    def handle_data(self, data):
+        if self.open:
+            self.results[self.open[-1]] += data
+    
+    def handle_endtag(self, tag):
+        if tag.startswith(self.prefix):
+            self.open.remove(tag.replace(self.prefix, '', 1))
+
+
+def read_text_concatenating(input, prefix):
+    data = ''
+    for file in input:
+        data += open(file, 'rU').read()
+    text = text_parser_concatenating(prefix)
+    text.feed(data)
+    return text
+
+
+def benchmark_read_text(sizes = [10 ** 4, 10 ** 5, 10 ** 6], max_original = 10 ** 5):
+    '''Logs with a single block of n_lines lines, with an entity on each line'''
+    if not os.path.exists('./build/'):
+        os.mkdir('./build/')
+    print 'read_text: seconds per log'
+    print '%10s %12s %12s' % ('lines', 'streaming', 'original')
+    for n_lines in sizes:
+        with open('./build/benchmark.log', 'wb') as f:
+            f.write('<textfill_block>\n')
+            f.writelines(['. display %d &amp; more\n' % line for line in range(n_lines)])
+            f.write('</textfill_block>\n')
+        input = ['./build/benchmark.log']
+        streaming = min(timeit.repeat(lambda: read_text(input, 'textfill_'), 
+                                      number = 1, repeat = 3))
+        if n_lines <= max_original:
+            assert read_text(input, 'textfill_').results == \
+                   read_text_concatenating(input, 'textfill_').results
+            original = '%12.4f' % min(timeit.repeat(lambda: read_text_concatenating(input, 'textfill_'),
+                                                    number = 1, repeat = 1))
+        else:
+            original = '%12s' % '-'
+        print '%10d %12.4f %s' % (n_lines, streaming, original)
+
+
+def write_data_to_lyx_concatenating(data, size):
+    '''The original writer, which grows the block by string concatenation'''
+    lyx_code = '\\begin_layout Plain Layout\n\\begin_inset ERT status collapsed\n' \
+               '\\begin_layout Plain Layout\n\\backslash\nbegin{verbatim}\n\\end_layout'
+    for line in data.split('\n'):
+        lyx_code += '\\begin_layout Plain Layout\n' + line + '\\end_layout\n'
+    lyx_code += '\\begin_layout Plain Layout\n\\backslash\nend{verbatim}\n' \
+                '\\end_layout\n\\end_inset\n\\end_layout'
+    return lyx_code
+
+
+def benchmark_write_data_to_lyx(sizes = [10 ** 4, 10 ** 5, 10 ** 6]):
+    '''Write a block of n_lines lines to a file'''
+    if not os.path.exists('./build/'):
+        os.mkdir('./build/')
+    print 'iter_data_to_lyx: seconds per block'
+    print '%10s %12s %12s' % ('lines', 'streaming', 'original')
+    for n_lines in sizes:
+        data = '\n'.join(['. display %d' % line for line in range(n_lines)])
+        assert write_data_to_lyx(data, 'Default') == \
+               write_data_to_lyx_concatenating(data, 'Default')
+        
+        def write_streaming():
+            with open('./build/benchmark_block.lyx', 'wb') as f:
+                f.writelines(iter_data_to_lyx(data, 'Default'))
+        def write_original():
+            with open('./build/benchmark_block.lyx', 'wb') as f:
+                f.write(write_data_to_lyx_concatenating(data, 'Default'))
+        streaming = min(timeit.repeat(write_streaming, number = 1, repeat = 3))
+        original  = min(timeit.repeat(write_original, number = 1, repeat = 3))
+        print '%10d %12.4f %12.4f' % (n_lines, streaming, original)
+
+
+def benchmark_textfill_batch(n_templates = 20, n_logs = 4, n_lines = 10 ** 5):
+    '''Fill n_templates templates from n_logs logs of n_lines lines each'''
+    if not os.path.exists('./build/'):
+        os.mkdir('./build/')
+    input = []
+    for n in range(n_logs):
+        input.append('./build/benchmark_%d.log' % n)
+        with open(input[-1], 'wb') as f:
+            f.write('<textfill_anchor%d>\n' % n)
+            f.writelines(['. display %d\n' % line for line in range(n_lines)])
+            f.write('</textfill_anchor%d>\n' % n)
+    with open('./build/benchmark_template.lyx', 'wb') as f:
+        f.writelines(make_template(n_logs))
+    templates = [('./build/benchmark_template.lyx', './build/benchmark_%d.lyx' % n) 
+                 for n in range(n_templates)]
+    
+    def fill_separately():
+        for template, output in templates:
+            textfill(input = ' '.join(input), template = template, output = output)
+    def fill_batch():
+        textfill_batch(input = ' '.join(input), templates = templates)
+    with nostderrout():
+        separately = min(timeit.repeat(fill_separately, number = 1, repeat = 3))
+        batch      = min(timeit.repeat(fill_batch, number = 1, repeat = 3))
+    print 'textfill_batch: seconds for %d templates from %d logs of %d lines' % \
+          (n_templates, n_logs, n_lines)
+    print '%12s %12s' % ('separately', 'batch')
+    print '%12.4f %12.4f' % (separately, batch)
+
+
+if __name__ == '__main__':
+    benchmark_fill_text()
+    benchmark_read_text()
+    benchmark_write_data_to_lyx()
+    benchmark_textfill_batch()
@@ -6,13 +6,16 @@ import os
 import re
 import decimal
 import shutil
+import json
 from subprocess import check_call, CalledProcessError
 
 # Ensure that Python can find and load the GSLab libraries
 #os.chdir(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append('../..')
 
-from gslab_fill import tablefill
+from gslab_fill import tablefill, tablefill_batch
+from gslab_fill.tablefill import parse_data, index_template, format_entries, \
+                                 read_binary_tables, write_binary_tables, CACHE_EXTENSION
 from gslab_make.tests import nostderrout
 
 
@@ -136,6 +139,219 @@ class testTablefill(unittest.TestCase):
 
             self.assertEqual(filled_data_args1, filled_data_args2)
 
+    def testParseData(self):
+        data = ['<Tab:First>\n',
+                '1\t.\t 3 \n',
+                '\t\n',
+                '---\t-2.5e+3\n',
+                '<TAB:Second>\n',
+                'a\t b\n']
+        tables = parse_data(data)
+        self.assertEqual(tables, {'first':  ['1', '3', '---', '-2.5e+3'],
+                                  'second': ['a', 'b']})
+
+        # Iterating lazily over the rows gives the same tables
+        self.assertEqual(parse_data(iter(data)), tables)
+
+        # Tables that are not requested are skipped
+        self.assertEqual(parse_data(data, set(['second', 'third'])), {'second': ['a', 'b']})
+
+    def testBinaryInput(self):
+        tables = [('Tab:First', ['1', '.', ' 3 ', '', '-2.5e+3']),
+                  ('tab:second', ['a', u'\xe9'])]
+        write_binary_tables(tables, './build/tables.tfb')
+        self.assertEqual(read_binary_tables('./build/tables.tfb'), 
+                         {'first':  ['1', '3', '-2.5e+3'],
+                          'second': ['a', '\xc3\xa9']})
+        self.assertEqual(read_binary_tables('./build/tables.tfb', set(['second'])), 
+                         {'second': ['a', '\xc3\xa9']})
+        
+        with open('./build/not_binary.tfb', 'wb') as f:
+            f.write('<tab:first>\n1\n')
+        with self.assertRaises(ValueError):
+            read_binary_tables('./build/not_binary.tfb')
+        with self.assertRaises(ValueError):
+            write_binary_tables({'first': ['1\x002']}, './build/null_byte.tfb')
+        
+        # Filling from binary input gives the same output as from text input
+        input = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                '../../gslab_fill/tests/input/tables_appendix_two.txt'
+        with open('../../gslab_fill/tests/input/tables_appendix.txt', 'rU') as f:
+            write_binary_tables(parse_data(f), './build/tables_appendix.tfb')
+        for ext in ['lyx', 'tex']:
+            template = '../../gslab_fill/tests/input/tablefill_template.%s' % ext
+            with nostderrout():
+                text = tablefill(input = input, template = template, 
+                                 output = './build/text_input.%s' % ext)
+                binary = tablefill(input = './build/tables_appendix.tfb ' + \
+                                           '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                                   template = template, output = './build/binary_input.%s' % ext)
+            self.assertIn('filled successfully', binary)
+            with open('./build/text_input.%s' % ext, 'rb') as f:
+                text_output = f.read()
+            with open('./build/binary_input.%s' % ext, 'rb') as f:
+                self.assertEqual(f.read(), text_output)
+
+    def testIndexTemplate(self):
+        lyx_text = ['name "tab:First"\n',
+                    '<cell>###</cell>\n',
+                    'text\n',
+                    '<cell>#2,#</cell>\n',
+                    '</lyxtabular>\n',
+                    'name "tab:Second"\n',
+                    '#0#\n']
+        self.assertEqual(index_template(lyx_text, 'lyx'),
+                         [('first',  [(1, None, None, False), (3, None, '2,', True)], True),
+                          ('second', [(6, None, '0', False)], False)])
+
+        tex_text = ['\\label{tab:First}\n',
+                    '### & a & #3# \\\\\n',
+                    '\\end{tabular}\n']
+        self.assertEqual(index_template(tex_text, 'tex'),
+                         [('first', [(1, 0, None, False), (1, 2, '3', False)], True)])
+
+    def testFormatEntries(self):
+        entries = ['2309.2093', '2309.2093', '-2.23e+10', '-0.0223', '---', 'abc', '-0.0004']
+        specs   = [('2', False), ('0,', True), ('7,', True), ('2', False), 
+                   ('3', False), (None, False), ('2,', True)]
+        self.assertEqual(format_entries(entries, specs),
+                         ['2309.21', '2,309', '-22,300,000,000.0000000', '-0.02', 
+                          '---', 'abc', '0.00'])
+        
+        with self.assertRaises(IndexError):
+            format_entries(entries[:2], specs)
+        with self.assertRaises(decimal.InvalidOperation):
+            format_entries(['abc'], [('2', False)])
+
+    def testResult(self):
+        for ext in ['lyx', 'tex']:
+            with nostderrout():
+                result = tablefill(input    = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                                              '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                                   template = '../../gslab_fill/tests/input/tablefill_template.%s' % ext, 
+                                   output   = './build/tablefill_template_filled.%s' % ext,
+                                   return_result = True,
+                                   json_log = './build/tablefill.json')
+            self.assertTrue(result.success)
+            self.assertIn('filled successfully', result.message)
+            self.assertEqual(sorted(result.timings.keys()), ['fill', 'index', 'parse', 'write'])
+            for counts in result.tables.values():
+                self.assertEqual(sorted(counts.keys()), ['filled', 'missing', 'unused'])
+            self.assertTrue(any(counts['filled'] > 0 for counts in result.tables.values()))
+            
+            with open('./build/tablefill.json', 'rU') as json_log:
+                self.assertEqual(json.load(json_log), json.loads(result.to_json()))
+
+        with nostderrout():
+            result = tablefill(input    = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                                          '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                               template = '../../gslab_fill/tests/input/tablefill_template_breaks.lyx', 
+                               output   = './build/tablefill_template_filled.lyx',
+                               return_result = True)
+        self.assertFalse(result.success)
+        self.assertEqual(result.status, 'error')
+        self.assertIn('InvalidOperation', result.message)
+
+    def testIncremental(self):
+        for ext in ['lyx', 'tex']:
+            shutil.copy('../../gslab_fill/tests/input/tables_appendix.txt', './build/')
+            shutil.copy('../../gslab_fill/tests/input/tables_appendix_two.txt', './build/')
+            kwargs = {'input':    './build/tables_appendix.txt ./build/tables_appendix_two.txt',
+                      'template': '../../gslab_fill/tests/input/tablefill_template.%s' % ext,
+                      'return_result': True}
+            
+            # The first run fills every table
+            with nostderrout():
+                first = tablefill(output = './build/incremental.%s' % ext, incremental = True, **kwargs)
+            self.assertTrue(first.success)
+            self.assertEqual(first.skipped, [])
+            
+            # A rerun with unchanged input copies every table
+            with nostderrout():
+                second = tablefill(output = './build/incremental.%s' % ext, incremental = True, **kwargs)
+            self.assertEqual(second.skipped, sorted(first.tables.keys()))
+            
+            # Only the changed table is filled again
+            with open('./build/tables_appendix.txt', 'rU') as f:
+                data = f.read()
+            self.assertIn('0.2171', data)
+            with open('./build/tables_appendix.txt', 'wb') as f:
+                f.write(data.replace('0.2171', '0.9999'))
+            with nostderrout():
+                third = tablefill(output = './build/incremental.%s' % ext, incremental = True, **kwargs)
+                full = tablefill(output = './build/full.%s' % ext, **kwargs)
+            self.assertTrue(third.success)
+            self.assertNotIn('diversity', third.skipped)
+            self.assertEqual(len(third.skipped), len(first.tables) - 1)
+            self.assertEqual(third.tables, full.tables)
+            
+            with open('./build/incremental.%s' % ext, 'rb') as f:
+                incremental_output = f.read()
+            with open('./build/full.%s' % ext, 'rb') as f:
+                self.assertEqual(incremental_output, f.read())
+
+    def testBatch(self):
+        templates = [('../../gslab_fill/tests/input/tablefill_template.%s' % ext, 
+                      './build/tablefill_template_batch.%s' % ext) for ext in ['lyx', 'tex']]
+        templates.append(('../../gslab_fill/tests/input/tablefill_template_breaks.lyx', 
+                          './build/tablefill_template_breaks.lyx'))
+        for processes in [1, 2]:
+            with nostderrout():
+                results = tablefill_batch(input     = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                                                      '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                                          templates = templates,
+                                          processes = processes)
+            self.assertEqual([result.status for result in results], ['success', 'success', 'error'])
+            self.assertEqual([result.output for result in results], [output for template, output in templates])
+            self.assertIn('InvalidOperation', results[2].message)
+            
+            for ext in ['lyx', 'tex']:
+                with nostderrout():
+                    tablefill(input    = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                                         '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                              template = '../../gslab_fill/tests/input/tablefill_template.%s' % ext, 
+                              output   = './build/tablefill_template_filled.%s' % ext)
+                with open('./build/tablefill_template_filled.%s' % ext, 'rU') as filled_file:
+                    filled_data = filled_file.read()
+                with open('./build/tablefill_template_batch.%s' % ext, 'rU') as batch_file:
+                    self.assertEqual(batch_file.read(), filled_data)
+
+        with nostderrout():
+            results = tablefill_batch(input     = '../../gslab_fill/tests/input/fake_file.txt', 
+                                      templates = templates)
+        self.assertEqual([result.status for result in results], ['error'] * 3)
+        self.assertIn('IOError', results[0].message)
+
+    def testTemplateCache(self):
+        for ext in ['lyx', 'tex']:
+            outputs = []
+            for cache_dir in [None, './build/cache/', './build/cache/']:
+                with nostderrout():
+                    message = tablefill(input     = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                                                    '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                                        template  = '../../gslab_fill/tests/input/tablefill_template.%s' % ext, 
+                                        output    = './build/tablefill_template_filled.%s' % ext,
+                                        cache_dir = cache_dir)
+                self.assertIn('filled successfully', message)
+                with open('./build/tablefill_template_filled.%s' % ext, 'rU') as filled_file:
+                    outputs.append(filled_file.read())
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[0], outputs[2])
+        self.assertEqual(len(os.listdir('./build/cache/')), 2)
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), 'requires os.symlink')
+    def testTemplateCacheEviction(self):
+        # A dangling link stands in for an entry removed by a concurrent run
+        os.makedirs('./build/cache/')
+        os.symlink('./removed', './build/cache/removed' + CACHE_EXTENSION)
+        with nostderrout():
+            message = tablefill(input     = '../../gslab_fill/tests/input/tables_appendix.txt ' + \
+                                            '../../gslab_fill/tests/input/tables_appendix_two.txt', 
+                                template  = '../../gslab_fill/tests/input/tablefill_template.lyx', 
+                                output    = './build/tablefill_template_filled.lyx',
+                                cache_dir = './build/cache/')
+        self.assertIn('filled successfully', message)
+
     def tearDown(self):
         if os.path.exists('./build/'):
             shutil.rmtree('./build/')
@@ -6,10 +6,14 @@ import re
 import types
 import HTMLParser
 import shutil
+import time
 
 sys.path.append('../..')
-from gslab_fill.textfill import (textfill, read_text, 
+from gslab_fill.textfill import (textfill, textfill_batch, read_text, read_logs, 
+                                 fill_text, write_data_to_lyx, iter_timed,
                                  remove_trailing_leading_blanklines)
+from gslab_fill.fill_result import FillResult
+textfill_module = sys.modules['gslab_fill.textfill']
 from gslab_make.tests import nostderrout
 
 class testTextfill(unittest.TestCase):
@@ -64,6 +68,87 @@ class testTextfill(unittest.TestCase):
             for n in range( len(raw_table) ):
                 self.assertIn(raw_table[n], raw_lyx)
     
+    def test_result(self):
+        with nostderrout():
+            result = textfill(input    = '../../gslab_fill/tests/input/legal.log', 
+                              template = '../../gslab_fill/tests/input/textfill_template.lyx', 
+                              output   = './build/textfill_template_filled.lyx',
+                              return_result = True)
+        self.assertTrue(result.success)
+        self.assertIn('filled successfully', result.message)
+        self.assertEqual(sorted(result.tables.keys()), ['test_long', 'test_small'])
+        for counts in result.tables.values():
+            self.assertGreater(counts['filled'], 0)
+            self.assertEqual(counts['missing'], 0)
+            self.assertEqual(counts['unused'], 0)
+        self.assertEqual(sorted(result.timings.keys()), ['fill', 'parse', 'write'])
+
+        with nostderrout():
+            result = textfill(input    = '../../gslab_fill/tests/input/tags_not_closed.log', 
+                              template = '../../gslab_fill/tests/input/textfill_template.lyx', 
+                              output   = './build/textfill_template_filled.lyx',
+                              return_result = True)
+        self.assertEqual(result.status, 'error')
+        self.assertIn('HTMLParseError', result.message)
+    
+    def test_fill_timing(self):
+        # Blocks generated while the output is written count towards 'fill' only
+        def chunks():
+            for n in range(2):
+                time.sleep(0.05)
+                yield 'chunk'
+        result = FillResult(None, None)
+        with result.timer('write'):
+            self.assertEqual(list(iter_timed(chunks(), result, 'fill')), ['chunk'] * 2)
+        self.assertGreaterEqual(result.timings['fill'], 0.09)
+        self.assertLess(result.timings['write'], 0.05)
+    
+    def test_fill_text(self):
+        class Text(object):
+            results = {'first': 'a', 'second': 'b'}
+        lyx_text = ['#LyX\n',
+                    'name "text:first"\n',
+                    'name "text:Second"\n',
+                    'name "text:missing"\n',
+                    '\\end_layout\n',
+                    'name "text:first"\n']
+        with open('./build/fill_text_template.lyx', 'wb') as f:
+            f.writelines(lyx_text)
+        args = {'template': './build/fill_text_template.lyx', 'size': 'Default'}
+        
+        # Anchors closed by the same layout are filled in reverse order
+        with self.assertRaises(IndexError):
+            fill_text(args, Text())
+        with open('./build/fill_text_template.lyx', 'ab') as f:
+            f.write('\\end_layout\n')
+        self.assertEqual(''.join(fill_text(args, Text())),
+                         ''.join(lyx_text[:5]) + 
+                         write_data_to_lyx('b', 'Default') + 
+                         write_data_to_lyx('a', 'Default') + 
+                         lyx_text[5] + '\\end_layout\n' + 
+                         write_data_to_lyx('a', 'Default'))
+    
+    def test_max_lines(self):
+        self.assertEqual(write_data_to_lyx('1\n2\n3', 'Default', max_lines = 3),
+                         write_data_to_lyx('1\n2\n3', 'Default'))
+        self.assertEqual(write_data_to_lyx('1\n2\n3\n4', 'Default', max_lines = 1),
+                         write_data_to_lyx('1\n[3 more lines truncated by textfill]', 'Default'))
+        
+        with nostderrout():
+            result = textfill(input     = '../../gslab_fill/tests/input/legal.log', 
+                              template  = '../../gslab_fill/tests/input/textfill_template.lyx', 
+                              output    = './build/textfill_max_lines.lyx',
+                              max_lines = 2,
+                              return_result = True)
+        self.assertTrue(result.success)
+        self.assertTrue(result.truncated)
+        for tag in result.tables:
+            self.assertEqual(result.tables[tag]['filled'], 2)
+        with open('./build/textfill_max_lines.lyx', 'rU') as f:
+            output = f.read()
+        for tag, truncated in result.truncated.items():
+            self.assertIn('[%d more lines truncated by textfill]' % truncated, output)
+    
     def test_tags_dont_match(self):
         with nostderrout():
             error = textfill(input    = '../../gslab_fill/tests/input/tags_dont_match.log', 
@@ -71,6 +156,97 @@ class testTextfill(unittest.TestCase):
                              output   = './build/textfill_template_filled.lyx')
         self.assertIn('ValueError', error)
         
+    def test_read_text_chunks(self):
+        input = ['../../gslab_fill/tests/input/legal.log', 
+                 '../../gslab_fill/tests/input/alternative_prefix.log']
+        results = read_text(input, 'textfill_').results
+        self.assertTrue(results)
+        
+        # Reading in small chunks gives the same blocks
+        chunk_size = textfill_module.READ_CHUNK_SIZE
+        try:
+            textfill_module.READ_CHUNK_SIZE = 7
+            self.assertEqual(read_text(input, 'textfill_').results, results)
+            with self.assertRaises(HTMLParser.HTMLParseError):
+                read_text('../../gslab_fill/tests/input/tags_not_closed.log', 'textfill_')
+        finally:
+            textfill_module.READ_CHUNK_SIZE = chunk_size
+        
+    def test_read_logs(self):
+        input = ['../../gslab_fill/tests/input/legal.log', 
+                 '../../gslab_fill/tests/input/alternative_prefix.log']
+        results = read_text(input, 'textfill_').results
+        for processes in [1, 2]:
+            self.assertEqual(read_logs(input, 'textfill_', processes).results, results)
+        
+        # Parsed logs are cached until they change
+        textfill_module.LOG_CACHE.clear()
+        shutil.copy(input[0], './build/legal.log')
+        cached_input = ['./build/legal.log', input[1]]
+        self.assertEqual(read_logs(cached_input, 'textfill_', cache = True).results, results)
+        self.assertEqual(len(textfill_module.LOG_CACHE), 2)
+        self.assertEqual(read_logs(cached_input, 'textfill_', cache = True).results, results)
+        self.assertEqual(len(textfill_module.LOG_CACHE), 2)
+        with open('./build/legal.log', 'ab') as f:
+            f.write('<textfill_extra>\nextra\n</textfill_extra>\n')
+        self.assertEqual(read_logs(cached_input, 'textfill_', cache = True).results['extra'], '\nextra\n')
+        self.assertEqual(len(textfill_module.LOG_CACHE), 3)
+        
+        # A block continuing in the next log is read as by read_text
+        with open('./build/first.log', 'wb') as f:
+            f.write('<textfill_split>\nfirst\n')
+        with open('./build/second.log', 'wb') as f:
+            f.write('second\n</textfill_split>\n')
+        split_input = ['./build/first.log', './build/second.log']
+        self.assertEqual(read_logs(split_input, 'textfill_', cache = True).results, 
+                         {'split': '\nfirst\nsecond\n'})
+        with self.assertRaises(HTMLParser.HTMLParseError):
+            read_logs(split_input[:1], 'textfill_')
+        with self.assertRaises(IOError):
+            read_logs(['./build/fake_file.log'], 'textfill_')
+        textfill_module.LOG_CACHE.clear()
+    
+    def test_batch(self):
+        templates = [('../../gslab_fill/tests/input/textfill_template.lyx', 
+                      './build/textfill_template_batch_%d.lyx' % n) for n in range(2)]
+        templates.append(('../../gslab_fill/tests/input/fake_template.lyx', 
+                          './build/fake_template.lyx'))
+        with nostderrout():
+            textfill(input    = '../../gslab_fill/tests/input/legal.log', 
+                     template = '../../gslab_fill/tests/input/textfill_template.lyx', 
+                     output   = './build/textfill_template_single.lyx',
+                     size     = 'tiny')
+        with open('./build/textfill_template_single.lyx', 'rb') as f:
+            filled_data = f.read()
+        
+        with nostderrout():
+            textfill(input    = '../../gslab_fill/tests/input/legal.log', 
+                     template = '../../gslab_fill/tests/input/textfill_template.lyx', 
+                     output   = './build/textfill_template_cached.lyx',
+                     size     = 'tiny',
+                     cache    = True)
+        with open('./build/textfill_template_cached.lyx', 'rb') as f:
+            self.assertEqual(f.read(), filled_data)
+        textfill_module.LOG_CACHE.clear()
+        
+        for processes in [1, 2]:
+            with nostderrout():
+                results = textfill_batch(input     = '../../gslab_fill/tests/input/legal.log', 
+                                         templates = templates, 
+                                         processes = processes,
+                                         size      = 'tiny')
+            self.assertEqual([result.status for result in results], ['success', 'success', 'error'])
+            self.assertIn('IOError', results[2].message)
+            for template, output in templates[:2]:
+                with open(output, 'rb') as f:
+                    self.assertEqual(f.read(), filled_data)
+        
+        with nostderrout():
+            results = textfill_batch(input     = '../../gslab_fill/tests/input/tags_not_closed.log', 
+                                     templates = templates)
+        self.assertEqual([result.status for result in results], ['error'] * 3)
+        self.assertIn('HTMLParseError', results[0].message)
+    
     def test_tags_not_closed(self):
         with nostderrout():   
             error = textfill(input    = '../../gslab_fill/tests/input/tags_not_closed.log', 
@@ -4,29 +4,113 @@ import os
 import argparse
 import types
 import traceback
+import time
+import collections
+import multiprocessing
 import textfill_info
+from fill_result import FillResult
 from HTMLParser import HTMLParser, HTMLParseError
 
+# Text anchors in the LyX template, e.g. 'name "text:name"'
+TEXT_TAG   = 'name "text:'
+END_LAYOUT = '\\end_layout\n'
+
+# Size of the chunks in which input logs are read
+READ_CHUNK_SIZE = 2 ** 20
+
+# Size of the chunks in which text blocks are written
+WRITE_CHUNK_SIZE = 2 ** 16
+
+# Last line of a block cut by max_lines
+TRUNCATED_NOTE = '[%d more lines truncated by textfill]'
+
+# Parsed input logs kept between calls, by (path, mtime, size, prefix)
+LOG_CACHE = collections.OrderedDict()
+LOG_CACHE_MAX_ENTRIES = 16
+
 
 def textfill(**kwargs):
+    result = FillResult(kwargs.get('template'), kwargs.get('output'))
     try:
         args = parse_arguments(kwargs)
-        text = parse_text(args)
-        insert_text(args, text)
-        exitmessage = args['template'] + ' filled successfully by textfill'
-        print exitmessage
-        return exitmessage	
+        with result.timer('parse'):
+            text = parse_text(args)
+        with result.timer('fill'):
+            lyx_text = fill_text(args, text, result)
+        with result.timer('write'):
+            write_text(args, lyx_text)
+        result.status  = 'success'
+        result.message = args['template'] + ' filled successfully by textfill'
+        print result.message
         
     except:
         print 'Error Found'
-        exitmessage = traceback.format_exc()
-        print exitmessage
-        return exitmessage    
+        result.status  = 'error'
+        result.message = traceback.format_exc()
+        print result.message
+    
+    if kwargs.get('json_log'):
+        result.write_json(kwargs['json_log'])
+    if kwargs.get('return_result'):
+        return result
+    return result.message
 
 # Set textfill's docstring as the text in "textfill_info.py"
 textfill.__doc__ = textfill_info.__doc__   
      
 
+def textfill_batch(input, templates, processes = None, cache = False, **kwargs):
+    '''
+    Fill many templates from a single parse of the input logs.
+
+    input is a space-delimited string of input logs, as in textfill, and 
+    templates is a list of (template, output) pairs. The logs are parsed 
+    concurrently by a pool of `processes` worker processes (by default one per 
+    CPU); `processes = 1` parses them in the current process. If cache is 
+    True, parsed logs are kept for later calls as in textfill. The other 
+    keyword arguments of textfill (size, remove_echoes, prefix, max_lines) 
+    apply to every template.
+
+    Returns a list of FillResult objects in the order of templates.
+    '''
+    results = [FillResult(template, output) for template, output in templates]
+    start = time.time()
+    try:
+        kwargs['input'] = input
+        args = parse_arguments(kwargs)
+        text = read_logs(args['input'], args['prefix'], processes, cache)
+        text = clean_text(text, args['remove_echoes'])
+    except:
+        exitmessage = traceback.format_exc()
+        for result in results:
+            result.status  = 'error'
+            result.message = exitmessage
+        text = None
+    
+    for result in results:
+        if text is None:
+            break
+        result.timings['parse'] = time.time() - start
+        try:
+            template_args = dict(args, template = result.template, output = result.output)
+            with result.timer('fill'):
+                lyx_text = fill_text(template_args, text, result)
+            with result.timer('write'):
+                write_text(template_args, lyx_text)
+            result.status  = 'success'
+            result.message = result.template + ' filled successfully by textfill'
+        except:
+            result.status  = 'error'
+            result.message = traceback.format_exc()
+    
+    for result in results:
+        if not result.success:
+            print 'Error Found'
+        print result.message
+    
+    return results
+
+
 def parse_arguments(kwargs):
     args = dict()
     if 'input' in kwargs.keys():
@@ -48,31 +132,144 @@ def parse_arguments(kwargs):
         args['prefix'] = kwargs['prefix'] + "_"
     else:
         args['prefix'] = 'textfill_'
+    if 'max_lines' in kwargs.keys():
+        args['max_lines'] = kwargs['max_lines']
+    else:
+        args['max_lines'] = None
+    if 'cache' in kwargs.keys():
+        args['cache'] = kwargs['cache']
+    else:
+        args['cache'] = False
     
     return args
 
 
 def parse_text(args):
-    text = read_text(args['input'], args['prefix'])
+    if args['cache']:
+        text = read_logs(args['input'], args['prefix'], processes = 1, cache = True)
+    else:
+        text = read_text(args['input'], args['prefix'])
     text = clean_text(text, args['remove_echoes'])
     
     return text
 
 
 def read_text(input, prefix):
-    data = ''
+    '''
+    Extract the tagged blocks of the input logs. The logs are read and 
+    parsed chunk by chunk, as if they were one concatenated file.
+    '''
     if isinstance(input, types.StringTypes):
         input = [input]
-    for file in input:
-        data += open(file, 'rU').read()
     text = text_parser(prefix)
-    text.feed(data)
+    rest = ''
+    for file in input:
+        rest = feed_file(text, file, rest)
+    text.feed(rest)
     text.close()
     
     return text
 
 
+def feed_file(text, file, rest = ''):
+    '''
+    Feed a log to the parser in chunks cut after a newline, so that no 
+    entity reference is split. Returns the data after the last newline, 
+    which has not been fed.
+    '''
+    with open(file, 'rU') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), ''):
+            chunk = rest + chunk
+            cut = chunk.rfind('\n') + 1
+            rest = chunk[cut:]
+            if cut:
+                text.feed(chunk[:cut])
+    
+    return rest
+
+
+def read_logs(input, prefix, processes = None, cache = False):
+    '''
+    Extract the tagged blocks of the input logs as read_text does, but parse 
+    each log on its own: concurrently in a pool of `processes` worker 
+    processes, or from LOG_CACHE if cache is True and the log is unchanged. 
+    If a log cannot be parsed on its own, e.g. because a block continues in 
+    the next log, all logs are parsed together by read_text.
+    '''
+    if isinstance(input, types.StringTypes):
+        input = [input]
+    try:
+        keys = [log_cache_key(file, prefix) for file in input]
+    except OSError:
+        return read_text(input, prefix)
+    
+    logs = [None] * len(input)
+    jobs = []
+    for n, key in enumerate(keys):
+        if cache and key in LOG_CACHE:
+            logs[n] = LOG_CACHE.pop(key)
+            LOG_CACHE[key] = logs[n]
+        else:
+            jobs.append((n, input[n], prefix))
+    
+    if processes == 1 or len(jobs) <= 1:
+        parsed = [parse_log_job(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(min(processes or multiprocessing.cpu_count(), len(jobs)))
+        try:
+            parsed = pool.map(parse_log_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    for (n, file, prefix), log in zip(jobs, parsed):
+        logs[n] = log
+        if cache and log is not None:
+            LOG_CACHE[keys[n]] = log
+            while len(LOG_CACHE) > LOG_CACHE_MAX_ENTRIES:
+                LOG_CACHE.popitem(last = False)
+    
+    if None in logs:
+        return read_text(input, prefix)
+    text = text_parser(prefix)
+    for results, closed in logs:
+        text.results.update(results)
+        text.closed.extend(closed)
+    
+    return text
+
+
+def log_cache_key(file, prefix):
+    stat = os.stat(file)
+    return (os.path.abspath(file), stat.st_mtime, stat.st_size, prefix)
+
+
+def parse_log_job(job):
+    n, file, prefix = job
+    return parse_log(file, prefix)
+
+
+def parse_log(file, prefix):
+    '''
+    Parse a single log. Returns its blocks and closed tags, or None if the 
+    log does not parse on its own: if it fails, or if it ends inside a tag.
+    '''
+    text = text_parser(prefix)
+    try:
+        text.feed(feed_file(text, file))
+        text.close()
+    except Exception:
+        return None
+    if text.open or text.rawdata or text.cdata_elem is not None:
+        return None
+    
+    return text.results, text.closed
+
+
 class text_parser(HTMLParser):
+    '''
+    Collect the data inside tags starting with prefix. While parsing, 
+    results maps each tag to its list of fragments; close joins them.
+    '''
     def __init__(self, prefix):
         HTMLParser.__init__(self)
         self.recording = False
@@ -85,12 +282,12 @@ class text_parser(HTMLParser):
         if tag.startswith(self.prefix):
             tag_name = tag.replace(self.prefix, '', 1)
             self.recording = True
-            self.results[tag_name] = ''
+            self.results[tag_name] = []
             self.open.append(tag_name)
     
     def handle_data(self, data):
         if self.recording:
-            self.results[self.open[-1]]+=data
+            self.results[self.open[-1]].append(data)
     
     def handle_endtag(self, tag):
         if tag.startswith(self.prefix):
@@ -104,6 +301,8 @@ class text_parser(HTMLParser):
         for tag in self.results.keys():
             if tag not in self.closed:
                 raise HTMLParseError('Tag %s is not closed' % tag)
+        for tag in self.results.keys():
+            self.results[tag] = ''.join(self.results[tag])
 
 
 def clean_text(text, remove_echoes):
@@ -129,41 +328,113 @@ def remove_trailing_leading_blanklines(list):
 
 
 def insert_text(args,text):
+    lyx_text = list(fill_text(args, text))
+    write_text(args, lyx_text)
+    
+    return lyx_text
+
+
+def fill_text(args, text, result = None):
+    '''
+    Return an iterator over the chunks of the filled template. The text 
+    blocks are only turned into LyX code as the chunks are consumed.
+    '''
     lyx_text = open(args['template'], 'rU').readlines()
-    # Loop over (expanding) raw LyX text
-    n = 0
-    loop = True
-    while loop==True:
-        n+=1 
-        if n<len(lyx_text):
-            if (lyx_text[n].startswith('name "text:')):
-                tag = lyx_text[n].replace('name "text:','',1).rstrip('"\n').lower()
-                if tag in text.results:
-                    # Insert text after preceding layout is closed
-                    insert_now = False
-                    i = n
-                    while insert_now is False:
-                        i+=1
-                        if lyx_text[i]=='\\end_layout\n':
-                            insert_now = True
-                    
-                    # Insert text
-                    for key in text.results:
-                        if tag==key:
-                            lyx_code = write_data_to_lyx(text.results[key], args['size'])
-                    lyx_text.insert(i+1, lyx_code)
-        else:
-            loop = False
+    anchors = index_text(lyx_text)
+    max_lines = args.get('max_lines')
     
+    # Text is inserted after the layout enclosing its anchor is closed. 
+    # Anchors closed by the same layout are inserted in reverse order.
+    insertions = {}
+    end = 0
+    for n, tag in anchors:
+        if tag in text.results:
+            if end <= n:
+                end = find_end_layout(lyx_text, n)
+            insertions.setdefault(end, []).insert(0, tag)
+            n_lines = text.results[tag].count('\n') + 1
+            if max_lines is not None and n_lines > max_lines:
+                if result is not None:
+                    result.truncated[tag] = result.truncated.get(tag, 0) + n_lines - max_lines
+                n_lines = max_lines
+            if result is not None:
+                result.count(tag, filled = n_lines)
+        elif result is not None:
+            result.count(tag, missing = 1)
+    
+    if result is not None:
+        for tag in text.results:
+            if tag not in result.tables:
+                result.count(tag, unused = text.results[tag].count('\n') + 1)
+    
+    return iter_chunks(lyx_text, insertions, text, args['size'], max_lines, result)
+
+
+def iter_chunks(lyx_text, insertions, text, size, max_lines = None, result = None):
+    for n, line in enumerate(lyx_text):
+        yield line
+        for tag in insertions.get(n, []):
+            chunks = iter_data_to_lyx(text.results[tag], size, max_lines)
+            if result is not None:
+                chunks = iter_timed(chunks, result, 'fill')
+            for chunk in chunks:
+                yield chunk
+
+
+def iter_timed(chunks, result, phase):
+    '''
+    Yield the chunks, adding the time spent generating them to phase. Blocks 
+    are generated as the output is written, so this keeps the time taken to 
+    fill them out of 'write'.
+    '''
+    chunks = iter(chunks)
+    while True:
+        with result.timer(phase):
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def index_text(lyx_text):
+    '''
+    Find the text anchors of a template in one pass. Returns a list of 
+    (line, tag) pairs, where tag is lower-case. The first line is never 
+    an anchor.
+    '''
+    anchors = []
+    for n in xrange(1, len(lyx_text)):
+        if lyx_text[n].startswith(TEXT_TAG):
+            tag = lyx_text[n].replace(TEXT_TAG, '', 1).rstrip('"\n').lower()
+            anchors.append((n, tag))
+    
+    return anchors
+
+
+def find_end_layout(lyx_text, n):
+    for i in xrange(n + 1, len(lyx_text)):
+        if lyx_text[i] == END_LAYOUT:
+            return i
+    raise IndexError('No layout is closed after line %d of the template' % n)
+
+
+def write_text(args, lyx_text):
     outfile = open(args['output'], 'wb')
-    outfile.write( ''.join(lyx_text) )
+    outfile.writelines(lyx_text)
     outfile.close()
-    
-    return lyx_text
 
 
-def write_data_to_lyx(data, size):
-    data_list = data.split('\n')
+def write_data_to_lyx(data, size, max_lines = None):
+    return ''.join(iter_data_to_lyx(data, size, max_lines))
+
+
+def iter_data_to_lyx(data, size, max_lines = None):
+    '''
+    Yield the LyX code of a verbatim block holding data, in chunks of about 
+    WRITE_CHUNK_SIZE bytes. If max_lines is given, lines beyond the first 
+    max_lines are replaced by a note giving how many were cut.
+    '''
     linewrap_beg = '\\begin_layout Plain Layout\n'
     linewrap_end = '\\end_layout\n'
     if size!='Default':
@@ -182,9 +453,21 @@ def write_data_to_lyx(data, size):
                 '\end_inset\n' \
                 '\end_layout'
     
-    lyx_code = preamble
-    for line in data_list:
-        lyx_code += linewrap_beg + line + linewrap_end
-    lyx_code += postamble
-    
-    return lyx_code
+    yield preamble
+    separator = linewrap_end + linewrap_beg
+    lines_left = max_lines
+    start = 0
+    while True:
+        end = data.find('\n', start + WRITE_CHUNK_SIZE)
+        lines = (data[start:] if end < 0 else data[start:end]).split('\n')
+        if lines_left is not None and len(lines) > lines_left:
+            truncated = data.count('\n', start) + 1 - lines_left
+            lines = lines[:lines_left] + [TRUNCATED_NOTE % truncated]
+            end = -1
+        yield linewrap_beg + separator.join(lines) + linewrap_end
+        if end < 0:
+            break
+        if lines_left is not None:
+            lines_left -= len(lines)
+        start = end + 1
+    yield postamble
@@ -41,6 +41,11 @@ It accepts LaTeX font size arguments, and defaults to same size as body. The arg
 'remove_echoes' determines whether or not Stata command echoes are removed from the 
 copied log.  It defaults to false.
 
+Very long sections of a log can be cut short with the optional argument 'max_lines'. 
+Only the first max_lines lines of each section are inserted, followed by a line 
+giving the number of lines cut, e.g. `[120 more lines truncated by textfill]`. 
+By default sections are inserted in full.
+
 
 ###########################
 Input File Format:
@@ -142,6 +147,44 @@ would produce output.lyx replacing the label with the verbatim input (removing S
 `test`
 
 
+######################
+# Caching Parsed Logs
+######################
+
+If the same large logs are used by several textfill calls, passing `cache = True` 
+keeps each parsed log in memory and reuses it in later calls of the same Python 
+process, for as long as the log's path, modification time and size are unchanged:
+
+```
+textfill( input = 'input_file(s)', template = 'template_file', output = 'output_file', 
+          cache = True )
+```
+
+
+######################
+# Filling Many Templates
+######################
+
+When several templates are filled from the same logs, `textfill_batch` parses 
+the logs once, each in its own worker process, and fills every template:
+
+```
+from gslab_fill.textfill import textfill_batch
+
+results = textfill_batch(input = 'input_file(s)', 
+                         templates = [('template_1.lyx', 'output_1.lyx'),
+                                      ('template_2.lyx', 'output_2.lyx')],
+                         processes = 4, size = 'tiny')
+```
+
+The optional arguments are `processes`, the number of worker processes (by 
+default, one per CPU), `cache`, as above, and textfill's optional arguments, 
+which apply to every template. A block that starts in one log and ends in the 
+next is still read correctly, but the logs are then parsed together. It returns 
+one result per template, in order, as described below. On Windows, scripts 
+that call `textfill_batch` must do so under an `if __name__ == '__main__':` guard.
+
+
 ######################
 # Error Logging
 ######################
@@ -159,4 +202,15 @@ exitmessage = textfill( input = 'input_file(s)', template = 'template_file', out
 
 Lines can then be added to make.py to output this string to a log file using standard 
 Python and built in gslab_make commands.
+
+With `return_result = True`, textfill instead returns a result object with the attributes 
+`status` ('success' or 'error'), `success` (True or False), `message` (the string above), 
+`tables` and `timings`. `tables` maps each tag to the number of lines 'filled' into the 
+template, the number of lines of tags the template does not use ('unused'), and the number 
+of anchors in the template with no matching tag in the input ('missing'). `timings` gives 
+the seconds spent in each phase: 'parse' (reading the input files), 'fill' (generating 
+the text blocks, which happens as they are written) and 'write' (the rest of writing the 
+output). 
+`truncated` maps each tag cut short by 'max_lines' to the number of lines cut. 
+Passing `json_log = 'log_file'` writes the same information to log_file as JSON.
 '''
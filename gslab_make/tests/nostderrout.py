@@ -7,6 +7,7 @@ def nostderrout():
     savestdout = sys.stdout
     class Devnull(object):
         def write(self, _): pass
+        def flush(self): pass
     sys.stderr = Devnull()    
     sys.stdout = Devnull()
     yield
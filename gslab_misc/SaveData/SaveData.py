@@ -1,22 +1,184 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
+import numpy as np
 import hashlib
 import re
 import pathlib
+import os
+import pickle
+import shutil
+import tempfile
+import gzip
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def SaveData(df, keys, out_file, log_file = '', append = False, sortbykey = True):
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Rows of an object column checked for lists at a time, and rows checked 
+# per object column when list_check = 'sampled'
+LIST_CHECK_CHUNK_SIZE = 1000000
+LIST_CHECK_SAMPLE_SIZE = 100000
+
+# Kinds returned by pd.api.types.infer_dtype that cannot include a list
+SCALAR_KINDS = ['empty', 'string', 'bytes', 'floating', 'integer', 'mixed-integer-float', 
+                'decimal', 'complex', 'boolean', 'datetime64', 'datetime', 'date', 
+                'timedelta64', 'timedelta', 'time', 'period', 'interval', 'categorical']
+
+# Number of duplicated key values listed when keys are not unique
+DUPLICATE_KEYS_REPORTED = 5
+
+# Extension dtypes whose values cannot be lists
+SCALAR_DTYPES = (pd.CategoricalDtype, pd.DatetimeTZDtype, pd.PeriodDtype, 
+                 pd.IntervalDtype, pd.StringDtype)
+
+# Number of files the keys are hash-partitioned into by SaveDataChunked, so 
+# that only one partition is held in memory when checking uniqueness
+KEY_SPILL_PARTITIONS = 64
+
+# df.to_csv formats this many cells at a time (pandas' default), and the 
+# blocks formatted in parallel are CSV_BLOCK_CHUNKS of those chunks
+CSV_CHUNK_CELLS = 100000
+CSV_BLOCK_CHUNKS = 10
+
+# Multipliers of the splitmix64 finalizer, which remixes row hashes into a 
+# second sum for the 'unordered' hash
+MIX_MULTIPLIERS = (np.uint64(0xbf58476d1ce4e5b9), np.uint64(0x94d049bb133111eb))
+
+# Appended to the log file name to give the file recording previous saves
+SAVE_CACHE_SUFFIX = '.cache'
+
+def SaveData(df, keys, out_file, log_file = '', append = False, sortbykey = True, 
+             list_check = 'exhaustive', compression = None, compression_level = None, 
+             csv_workers = None, hash_mode = 'ordered', skip_unchanged = False):
     extension = CheckExtension(out_file)
-    CheckColumnsNotList(df)
-    CheckKeys(df, keys)
+    CheckCompression(extension, compression, compression_level)
+    CheckHashMode(hash_mode, sortbykey, skip_unchanged)
+    # Non-missing counts and column hashes are computed once and shared by 
+    # the key checks, the MD5 hash and the summary statistics
+    hashes = {} if df.columns.is_unique else None
+    
+    CheckColumnsNotList(df, list_check)
+    counts = df.count()
+    order = CheckKeys(df, keys, sortbykey, counts, hashes, 
+                      check_lists = list_check != 'exhaustive')
+    df = ReorderColumns(df, keys)
+    df_hash = GetHash(df, hashes, hash_mode)
+    
+    # An output saved from data with the same hash, columns, dtypes and 
+    # settings, and not modified since, is left as it is and its log entry 
+    # is written again
+    cache = None
+    if skip_unchanged and log_file:
+        cache = {'hash': df_hash, 'columns': [str(col) for col in df.columns], 
+                 'dtypes': [str(dtype) for dtype in df.dtypes], 
+                 'hash_mode': hash_mode, 'keys': [str(key) for key in keys], 
+                 'sortbykey': sortbykey, 'compression': compression, 
+                 'compression_level': compression_level}
+        log_entry = ReadSaveCache(log_file, out_file, cache)
+        if log_entry is not None:
+            print(f"File '{out_file}' is unchanged and was not saved again.")
+            WriteLog(log_entry, append, log_file)
+            return
+    
+    # Counts are shared by label, which repeated column names make ambiguous
+    summary_stats = GetSummaryStats(df, counts if df.columns.is_unique else None)
+    SaveDf(df, keys, out_file, sortbykey, extension, order, compression, compression_level, 
+           csv_workers)
+    log_entry = SaveLog(df_hash, keys, summary_stats, out_file, append, log_file)
+    if cache is not None:
+        WriteSaveCache(log_file, out_file, cache, log_entry)
+
+
+def ReorderColumns(df, keys):
     # reorder df so keys are on the left
     cols_reordered = keys + [col for col in df.columns if col not in keys]
-    df = df[cols_reordered]
-    df_hash = hashlib.md5(pd.util.hash_pandas_object(df).values).hexdigest() 
-    summary_stats = GetSummaryStats(df)
-    SaveDf(df, keys, out_file, sortbykey, extension)
-    SaveLog(df_hash, keys, summary_stats, out_file, append, log_file)
+    return df[cols_reordered]
+
+
+def SaveDataChunked(chunks, keys, out_file, log_file = '', append = False, 
+                    list_check = 'exhaustive', spill_dir = None, hash_mode = 'ordered'):
+    # Saves an iterable of DataFrames, e.g. pd.read_csv(..., chunksize = n), 
+    # without holding more than one chunk in memory. Rows are written in the 
+    # order given, as the data cannot be sorted. Keys are spilled to disk and 
+    # checked for uniqueness once all chunks are written. The file and hash 
+    # match SaveData(..., sortbykey = False) on the concatenated chunks when 
+    # every chunk has the same dtypes (pass dtype to pd.read_csv to ensure it).
+    extension = CheckExtension(out_file)
+    if extension != '.csv':
+        raise ValueError("SaveDataChunked can only save .csv files.")
+    CheckHashMode(hash_mode)
     
+    spill_path = tempfile.mkdtemp(dir = spill_dir)
+    spill_files = [open(os.path.join(spill_path, '%d.pkl' % i), 'wb') 
+                   for i in range(KEY_SPILL_PARTITIONS)]
+    written = False
+    try:
+        df_hash = hashlib.md5()
+        row_hash_sums = np.zeros(3, dtype = np.uint64)
+        columns = None
+        schema = None
+        counts = None
+        moments = {}
+        n_rows = 0
+        for chunk in chunks:
+            if columns is None:
+                if not chunk.columns.is_unique:
+                    raise ValueError("SaveDataChunked requires unique column names.")
+                columns = chunk.columns
+            elif not chunk.columns.equals(columns):
+                raise ValueError("Every chunk must have the same columns.")
+            CheckColumnsNotList(chunk, list_check)
+            chunk_counts = chunk.count()
+            hashes = {} if chunk.columns.is_unique else None
+            CheckKeys(chunk, keys, False, chunk_counts, hashes, 
+                      check_lists = list_check != 'exhaustive')
+            if schema is not None and not chunk[keys].dtypes.equals(schema[keys].dtypes):
+                raise ValueError("Keys must have the same type in every chunk.")
+            
+            chunk = ReorderColumns(chunk, keys)
+            SpillKeys(chunk[keys], KeyColumnHashes(chunk[keys], hashes), n_rows, spill_files)
+            if hash_mode == 'unordered':
+                row_hash_sums += RowHashSums(CombineHashes(ColumnHashes(chunk, hashes)))
+            else:
+                df_hash.update(GetRowHashes(chunk, hashes))
+            UpdateMoments(moments, chunk)
+            
+            # The output has the dtypes of the chunks concatenated
+            schema = chunk.iloc[:0] if schema is None else pd.concat([schema, chunk.iloc[:0]])
+            counts = chunk_counts if counts is None else counts + chunk_counts
+            n_rows += len(chunk)
+            
+            chunk.to_csv(out_file, index = False, header = not written, 
+                         mode = 'a' if written else 'w')
+            written = True
+        
+        if schema is None:
+            raise ValueError("No chunks were given to save.")
+        for spill_file in spill_files:
+            spill_file.close()
+        duplicates = FindDuplicateKeysSpilled([spill_file.name for spill_file in spill_files])
+        if len(duplicates):
+            raise DuplicateKeysError(keys, duplicates)
+    except BaseException:
+        if written:
+            os.remove(out_file)
+        raise
+    finally:
+        for spill_file in spill_files:
+            spill_file.close()
+        shutil.rmtree(spill_path)
+    
+    print(f"File '{out_file}' saved successfully.")
+    if hash_mode == 'unordered':
+        df_hash = hashlib.md5(row_hash_sums)
+    summary_stats = GetChunkedSummaryStats(schema, counts[schema.columns], moments)
+    SaveLog(df_hash.hexdigest(), keys, summary_stats, out_file, append, log_file)
+
 
 def CheckExtension(out_file):
     if type(out_file) == str:
@@ -25,19 +187,71 @@ def CheckExtension(out_file):
         extension = [out_file.suffix]
     else:
         raise ValueError('Output file format must either be string or pathlib.PosixPath')
-    if not extension[0] in ['.csv', '.dta']:
-        raise ValueError("File extension should be one of .csv or .dta.")
+    if not extension[0] in ['.csv', '.dta', '.parquet', '.feather']:
+        raise ValueError("File extension should be one of .csv, .dta, .parquet or .feather.")
     return extension[0]
 
-def CheckColumnsNotList(df):
-    type_list = [any(df[col].apply(lambda x: type(x) == list)) for col in df.columns]
+
+def CheckCompression(extension, compression, compression_level):
+    # For .parquet and .feather files compression is passed on to pyarrow, 
+    # which checks the codec and level. None keeps the pyarrow default (snappy 
+    # for parquet, lz4 for feather); 'none' and 'uncompressed' turn it off.
+    if compression is None and compression_level is None:
+        return
+    if extension == '.csv':
+        if compression not in ['gzip', 'zstd']:
+            raise ValueError("Compression of .csv files should be one of 'gzip' or 'zstd'.")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package.")
+    elif extension not in ['.parquet', '.feather']:
+        raise ValueError("Compression is only supported for .csv, .parquet and .feather files.")
+
+def CheckHashMode(hash_mode, sortbykey = True, skip_unchanged = False):
+    if hash_mode not in ['ordered', 'unordered']:
+        raise ValueError("hash_mode should be one of 'ordered' or 'unordered'.")
+    # Without sorting, data with the same 'unordered' hash can be saved in 
+    # a different row order
+    if skip_unchanged and hash_mode == 'unordered' and not sortbykey:
+        raise ValueError("skip_unchanged with hash_mode = 'unordered' requires sortbykey.")
+
+
+def CheckColumnsNotList(df, list_check = 'exhaustive'):
+    if list_check == 'exhaustive':
+        sample_size = None
+    elif list_check == 'sampled':
+        sample_size = LIST_CHECK_SAMPLE_SIZE
+    else:
+        raise ValueError("list_check should be one of 'exhaustive' or 'sampled'.")
+    
+    type_list = [ColumnContainsList(df.iloc[:, i], sample_size) for i in range(df.shape[1])]
     if any(type_list):
         type_list_columns = df.columns[type_list]
         raise TypeError("No column can be of type list - check the following columns: " + ", ".join(type_list_columns))
+
+
+def ColumnContainsList(col, sample_size = None):
+    # Numeric, boolean, datetime, string and categorical columns cannot hold 
+    # lists; object columns and other extension types are checked
+    dtype = col.dtype
+    if isinstance(dtype, np.dtype) and dtype != object:
+        return False
+    if isinstance(dtype, SCALAR_DTYPES) or pd.api.types.is_numeric_dtype(dtype) or \
+            pd.api.types.is_bool_dtype(dtype):
+        return False
+    if sample_size is not None and len(col) > sample_size:
+        col = col.sample(sample_size, random_state = 0)
+    
+    values = col.to_numpy()
+    for start in range(0, len(values), LIST_CHECK_CHUNK_SIZE):
+        chunk = values[start:start + LIST_CHECK_CHUNK_SIZE]
+        if pd.api.types.infer_dtype(chunk, skipna = True) in SCALAR_KINDS:
+            continue
+        if list in set(map(type, chunk)):
+            return True
+    return False
        
-      
 
-def CheckKeys(df, keys):
+def CheckKeys(df, keys, sortbykey = False, counts = None, hashes = None, check_lists = True):
     if not isinstance(keys, list):
         raise TypeError("Keys must be specified as a list.")
         
@@ -48,29 +262,247 @@ def CheckKeys(df, keys):
     
     df_keys = df[keys]
     
-    keys_with_missing = df_keys.columns[df_keys.isnull().any()]
-    if keys_with_missing.any():
+    if counts is None:
+        counts = df_keys.count()
+    keys_with_missing = [key for key in keys if counts[key] < len(df)]
+    if keys_with_missing:
         missings_string = ', '.join(keys_with_missing)
         raise ValueError(f'The following keys are missing in some rows: {missings_string}.')
 
-    
+    # Not needed if every column has been checked by CheckColumnsNotList
+    if check_lists:
+        type_list = any([ColumnContainsList(df[keycol]) for keycol in keys])
+        if type_list:
+            raise TypeError("No key can contain keys of type list")
 
+    # When the data is to be sorted, duplicates are found next to each other 
+    # in sorted order, which is returned for SaveDf to reuse
+    order = SortOrder(df_keys) if sortbykey else None
+    if order is not None:
+        duplicates = FindDuplicateKeysSorted(df_keys, order)
+    else:
+        duplicates = FindDuplicateKeysHashed(df_keys, hashes)
+    if len(duplicates):
+        raise DuplicateKeysError(keys, duplicates)
     
-    type_list = any([any(df[keycol].apply(lambda x: type(x) == list)) for keycol in keys])
-    if type_list:
-        raise TypeError("No key can contain keys of type list")
+    return order
 
+
+def DuplicateKeysError(keys, duplicates):
+    if len(keys) == 1:
+        duplicates = [key[0] for key in duplicates]
+    duplicates_string = ', '.join([str(key) for key in duplicates])
+    return ValueError("Keys do not uniquely identify the observations. "
+                      f"First duplicated keys: {duplicates_string}.")
+
+
+def SortOrder(df_keys):
+    # Positions of the rows sorted by the keys, or None if the keys cannot be 
+    # sorted (e.g. an object column mixing strings and numbers)
+    try:
+        df_sorted = df_keys.reset_index(drop = True).sort_values(list(df_keys.columns))
+    except TypeError:
+        return None
+    return df_sorted.index.to_numpy()
+
+
+def FindDuplicateKeysSorted(df_keys, order):
+    same = np.ones(max(len(order) - 1, 0), dtype = bool)
+    for i in range(df_keys.shape[1]):
+        values = df_keys.iloc[:, i].to_numpy()[order]
+        same &= values[1:] == values[:-1]
+    # First row of each run of equal keys
+    first = same & ~np.concatenate([[False], same[:-1]])
+    positions = order[:-1][first][:DUPLICATE_KEYS_REPORTED]
+    return KeyTuples(df_keys, positions)
+
+
+def FindDuplicateKeysHashed(df_keys, hashes = None):
+    positions = DuplicateKeyPositions(df_keys, hashes)[:DUPLICATE_KEYS_REPORTED]
+    return KeyTuples(df_keys, positions)
+
+
+def DuplicateKeyPositions(df_keys, hashes = None):
+    # Rows whose key hashes collide are candidates, which are then compared 
+    # exactly so that a hash collision is never reported as a duplicate
+    key_hashes = CombineHashes(KeyColumnHashes(df_keys, hashes))
+    candidates = np.flatnonzero(pd.Series(key_hashes).duplicated(keep = False).to_numpy())
+    if not len(candidates):
+        return candidates
+    df_candidates = df_keys.iloc[candidates]
+    # First row of each duplicated key
+    first = df_candidates.duplicated(keep = False).to_numpy() & \
+            ~df_candidates.duplicated(keep = 'first').to_numpy()
+    return candidates[first]
+
+
+def SpillKeys(df_keys, key_column_hashes, start, spill_files):
+    # Appends the keys to the file of their hash partition, indexed by row 
+    # number in the full data
+    partitions = CombineHashes(key_column_hashes) % np.uint64(len(spill_files))
+    df_keys = df_keys.set_axis(pd.RangeIndex(start, start + len(df_keys)))
+    for partition in np.unique(partitions):
+        pickle.dump(df_keys[partitions == partition], spill_files[partition], 
+                    protocol = pickle.HIGHEST_PROTOCOL)
+
+
+def FindDuplicateKeysSpilled(spill_file_names):
+    # Equal keys are in the same partition, so each is checked on its own
+    found = []
+    for spill_file_name in spill_file_names:
+        df_keys = list(LoadSpilledKeys(spill_file_name))
+        if not df_keys:
+            continue
+        df_keys = pd.concat(df_keys)
+        positions = DuplicateKeyPositions(df_keys)[:DUPLICATE_KEYS_REPORTED]
+        found += zip(df_keys.index[positions], KeyTuples(df_keys, positions))
+    return [key for row, key in sorted(found)[:DUPLICATE_KEYS_REPORTED]]
+
+
+def LoadSpilledKeys(spill_file_name):
+    with open(spill_file_name, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def KeyTuples(df_keys, positions):
+    return list(df_keys.iloc[positions].itertuples(index = False, name = None))
         
-    if not all(df.groupby(keys).size() == 1):
-        raise ValueError("Keys do not uniquely identify the observations.")
-        
 
-def GetSummaryStats(df):
-    var_types = df.dtypes
+def ColumnHashes(df, hashes = None):
+    # Hash of each column as in pd.util.hash_pandas_object, reused from and 
+    # stored in the hashes dictionary if given
+    if hashes is None:
+        hashes = {}
+    for col in df.columns:
+        if col not in hashes:
+            hashes[col] = pd.util.hash_pandas_object(df[col], index = False).to_numpy()
+    return [hashes[col] for col in df.columns]
+
+
+def KeyColumnHashes(df_keys, hashes = None):
+    # Column hashes of the keys, with -0.0 and NaN made canonical in float 
+    # columns so that keys comparing equal hash equally. Other columns, and 
+    # float columns holding neither, reuse the hashes of ColumnHashes.
+    key_hashes = []
+    for col in df_keys.columns:
+        column = df_keys[col]
+        if pd.api.types.is_float_dtype(column.dtype):
+            values = column.to_numpy(dtype = np.float64, na_value = np.nan)
+            missing = np.isnan(values)
+            if missing.any() or np.signbit(values[values == 0]).any():
+                column = (column + 0.0).where(~missing)
+                key_hashes.append(pd.util.hash_pandas_object(column, index = False).to_numpy())
+                continue
+        key_hashes += ColumnHashes(df_keys[[col]], hashes)
+    return key_hashes
+
+
+def CombineHashes(arrays):
+    # Row hashes from column hashes, combined as pd.util.hash_pandas_object 
+    # combines the columns of a DataFrame
+    if not arrays:
+        return np.array([], dtype = np.uint64)
+    mult = np.uint64(1000003)
+    out = np.zeros_like(arrays[0]) + np.uint64(0x345678)
+    for i, array in enumerate(arrays):
+        inverse_i = len(arrays) - i
+        out ^= array
+        out *= mult
+        mult += np.uint64(82520 + inverse_i + inverse_i)
+    out += np.uint64(97531)
+    return out
+
+
+def GetHash(df, hashes = None, hash_mode = 'ordered'):
+    # MD5 hash of pd.util.hash_pandas_object(df), reusing column hashes, or 
+    # with hash_mode = 'unordered' of sums of the row hashes without the 
+    # index, which do not depend on the order of the rows
+    if hash_mode == 'unordered':
+        return hashlib.md5(RowHashSums(CombineHashes(ColumnHashes(df, hashes)))).hexdigest()
+    return hashlib.md5(GetRowHashes(df, hashes)).hexdigest()
+
+
+def GetRowHashes(df, hashes = None):
+    if hashes is None:
+        return pd.util.hash_pandas_object(df).values
+    index_hash = pd.util.hash_pandas_object(df.index, index = False).to_numpy()
+    return CombineHashes(ColumnHashes(df, hashes) + [index_hash])
+
+
+def RowHashSums(row_hashes):
+    # Number of rows and sums modulo 2 ** 64 of the row hashes and of their 
+    # remixed values, which chunks of rows add up to in any order
+    mixed = row_hashes ^ (row_hashes >> np.uint64(30))
+    mixed *= MIX_MULTIPLIERS[0]
+    mixed ^= mixed >> np.uint64(27)
+    mixed *= MIX_MULTIPLIERS[1]
+    mixed ^= mixed >> np.uint64(31)
+    return np.array([len(row_hashes), row_hashes.sum(dtype = np.uint64), 
+                     mixed.sum(dtype = np.uint64)], dtype = np.uint64)
+
+
+def UpdateMoments(moments, df):
+    # Running count, mean, sum of squared deviations, min and max of each 
+    # numeric and datetime column, combining chunks as in Chan et al. (1979)
+    for col in df.columns:
+        if pd.api.types.is_bool_dtype(df[col]):
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            values = df[col].to_numpy(dtype = 'float64', na_value = np.nan)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            mean = values.mean()
+            chunk = [len(values), mean, ((values - mean) ** 2).sum(), values.min(), values.max()]
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            values = df[col].dropna()
+            if not len(values):
+                continue
+            chunk = [len(values), values.mean(), np.nan, values.min(), values.max()]
+        else:
+            continue
+        if col not in moments:
+            moments[col] = chunk
+            continue
+        n_a, mean_a, m2_a, min_a, max_a = moments[col]
+        n_b, mean_b, m2_b, min_b, max_b = chunk
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        m2 = np.nan if isinstance(delta, pd.Timedelta) else m2_a + m2_b + delta ** 2 * n_a * n_b / n
+        moments[col] = [n, mean_a + delta * (n_b / n), m2, min(min_a, min_b), max(max_a, max_b)]
+
+
+def GetChunkedSummaryStats(schema, counts, moments):
+    # Summary statistics laid out as GetSummaryStats would for the full data. 
+    # Counts, means, standard deviations, minima and maxima are exact up to 
+    # rounding; quantiles and numbers of unique values are left blank.
+    var_stats = schema.describe(include='all').transpose()
+    var_stats.loc[:, :] = np.nan
+    for col, (n, mean, m2, low, high) in moments.items():
+        is_numeric = pd.api.types.is_numeric_dtype(schema[col]) and \
+                     not pd.api.types.is_bool_dtype(schema[col])
+        if is_numeric or pd.api.types.is_datetime64_any_dtype(schema[col]):
+            var_stats.loc[col, ['mean', 'min', 'max']] = [mean, low, high]
+        if is_numeric and n > 1:
+            var_stats.loc[col, 'std'] = np.sqrt(m2 / (n - 1))
+    return FormatSummaryStats(schema.dtypes, var_stats, counts)
+
+
+def GetSummaryStats(df, counts = None):
+    var_stats = df.describe(include='all').transpose()
+    return FormatSummaryStats(df.dtypes, var_stats, 
+                              counts if counts is not None else df.notnull().sum())
+
+
+def FormatSummaryStats(var_types, var_stats, counts):
     with pd.option_context("future.no_silent_downcasting", True):
-        var_stats = df.describe(include='all').transpose().fillna('').infer_objects(copy=False)
+        var_stats = var_stats.fillna('').infer_objects(copy=False)
 
-    var_stats['count'] = df.notnull().sum()
+    var_stats['count'] = counts
     var_stats = var_stats.drop(columns=['top', 'freq'], errors='ignore')
     
     summary_stats = pd.DataFrame({'type': var_types}).\
@@ -80,42 +512,132 @@ def GetSummaryStats(df):
     return summary_stats
 
 
-def SaveDf(df, keys, out_file, sortbykey, extension):
-    if sortbykey:
+def SaveDf(df, keys, out_file, sortbykey, extension, order = None, compression = None, 
+           compression_level = None, csv_workers = None):
+    if sortbykey and order is not None:
+        df = df.take(order)
+    elif sortbykey:
         df.sort_values(keys, inplace = True)
     
-    if extension == '.csv':
+    options = {}
+    if compression is not None:
+        options['compression'] = compression
+    if compression_level is not None:
+        options['compression_level'] = compression_level
+    
+    if extension == '.csv' and csv_workers is None and compression is None:
         df.to_csv(out_file, index = False)
+    elif extension == '.csv':
+        SaveCsvBlocks(df, out_file, csv_workers, compression, compression_level)
     if extension == '.dta':
         df.to_stata(out_file, write_index = False)
+    if extension == '.parquet':
+        df.to_parquet(out_file, index = False, **options)
+    if extension == '.feather':
+        # Feather cannot store an index other than the default one
+        df.reset_index(drop = True).to_feather(out_file, **options)
 
     print(f"File '{out_file}' saved successfully.")
     
 
+def SaveCsvBlocks(df, out_file, workers = None, compression = None, compression_level = None):
+    # Formats and compresses blocks of rows in a pool of worker processes and 
+    # writes them in order. Blocks are whole multiples of the chunks to_csv 
+    # formats at a time, so the output is byte-identical to df.to_csv. 
+    # Compressed output is multi-member gzip or multi-frame zstd, one member 
+    # or frame per block. pandas, gzip and zstd -d read the whole stream, but 
+    # readers that stop after one frame, such as a one-shot 
+    # zstandard.ZstdDecompressor().decompress, return only the first block.
+    chunk_rows = max(CSV_CHUNK_CELLS // max(df.shape[1], 1), 1)
+    block_rows = chunk_rows * CSV_BLOCK_CHUNKS
+    header = df.iloc[:0].to_csv(index = False)
+    blocks = [(df.iloc[start:start + block_rows], chunk_rows, '' if start else header, 
+               compression, compression_level) 
+              for start in range(0, max(len(df), 1), block_rows)]
+    
+    with open(out_file, 'wb') as f:
+        if workers is None or workers <= 1:
+            for block in blocks:
+                f.write(FormatCsvBlock(*block))
+            return
+        # Bound the number of blocks in flight so that memory use stays flat
+        with ProcessPoolExecutor(workers) as executor:
+            pending = deque()
+            for block in blocks:
+                pending.append(executor.submit(FormatCsvBlock, *block))
+                if len(pending) >= 2 * workers:
+                    f.write(pending.popleft().result())
+            while pending:
+                f.write(pending.popleft().result())
+
+
+def FormatCsvBlock(df, chunk_rows, header, compression = None, compression_level = None):
+    data = (header + df.to_csv(index = False, header = False, chunksize = chunk_rows)).encode('utf-8')
+    if compression == 'gzip':
+        level = 9 if compression_level is None else compression_level
+        return gzip.compress(data, compresslevel = level, mtime = 0)
+    if compression == 'zstd':
+        level = 3 if compression_level is None else compression_level
+        return zstandard.ZstdCompressor(level = level).compress(data)
+    return data
+
+
 def SaveLog(df_hash, keys, summary_stats, out_file, append, log_file):
+    log_entry = 'File: %s\n\n' % (out_file)
+    log_entry += 'MD5 hash: %s\n\n' % (df_hash)
+    log_entry += 'Keys: '
+    for item in keys:
+        log_entry += '%s ' % (item)
+    log_entry += '\n\n'
+    log_entry += summary_stats.to_string(header = True, index = True)
+    log_entry += "\n\n"
+    WriteLog(log_entry, append, log_file)
+    return log_entry
+
+
+def WriteLog(log_entry, append, log_file):
     if log_file: 
         if append:
             with open(log_file, 'a') as f:
                 f.write('\n\n')
-                f.write('File: %s\n\n' % (out_file))
-                f.write('MD5 hash: %s\n\n' % (df_hash))
-                f.write('Keys: ')
-                for item in keys:
-                    f.write('%s ' % (item))
-                f.write('\n\n')
-                f.write(summary_stats.to_string(header = True, index = True))
-                f.write("\n\n")
+                f.write(log_entry)
         else:
             with open(log_file, 'w') as f:
-                f.write('File: %s\n\n' % (out_file))
-                f.write('MD5 hash: %s\n\n' % (df_hash))
-                f.write('Keys: ')
-                for item in keys:
-                    f.write('%s ' % (item))
-                f.write('\n\n')
-                f.write(summary_stats.to_string(header = True, index = True))
-                f.write("\n\n")
-        
-        f.close()    
+                f.write(log_entry)
     else:
         pass
+
+
+def ReadSaveCache(log_file, out_file, cache):
+    # Log entry of the previous save of out_file if it had the same settings 
+    # and the file has not changed since
+    entries = LoadSaveCache(log_file)
+    entry = entries.get(os.path.abspath(out_file))
+    if entry is None or entry['settings'] != cache or not os.path.isfile(out_file):
+        return None
+    stat = os.stat(out_file)
+    if [stat.st_size, stat.st_mtime_ns] != [entry['size'], entry['mtime_ns']]:
+        return None
+    return entry['log']
+
+
+def WriteSaveCache(log_file, out_file, cache, log_entry):
+    entries = LoadSaveCache(log_file)
+    stat = os.stat(out_file)
+    entries[os.path.abspath(out_file)] = {'settings': cache, 'size': stat.st_size, 
+                                          'mtime_ns': stat.st_mtime_ns, 'log': log_entry}
+    # Written to a temporary file and moved into place, so that an 
+    # interrupted save never leaves a partial cache
+    cache_file = str(log_file) + SAVE_CACHE_SUFFIX
+    with open(cache_file + '.tmp', 'w') as f:
+        json.dump(entries, f)
+    os.replace(cache_file + '.tmp', cache_file)
+
+
+def LoadSaveCache(log_file):
+    try:
+        with open(str(log_file) + SAVE_CACHE_SUFFIX) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
@@ -0,0 +1,142 @@
+'''
+Benchmarks for `SaveData`. Run with
+`python benchmark_SaveData.py [rows ...]`
+from `SaveData/tests/`, e.g. `python benchmark_SaveData.py 1000000 10000000 100000000`.
+'''
+
+import os
+import sys
+import timeit
+import tempfile
+import hashlib
+import numpy as np
+import pandas as pd
+
+sys.path.append('..')
+
+from SaveData import (CheckKeys, CheckColumnsNotList, GetHash, GetSummaryStats, SaveDf, 
+                      SaveCsvBlocks)
+
+
+def MakePanel(n_rows, n_years = 10):
+    # Firm-year panel in random row order, with a string key
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'firm': np.arange(n_rows) // n_years,
+                       'year': 2000 + np.arange(n_rows) % n_years,
+                       'value': rng.random(n_rows)})
+    df = df.take(rng.permutation(n_rows))
+    df['state'] = (df['firm'] % 50).astype(str)
+    return df
+
+
+def CheckKeysGroupby(df, keys):
+    # The original uniqueness check
+    if not all(df.groupby(keys).size() == 1):
+        raise ValueError("Keys do not uniquely identify the observations.")
+
+
+def BenchmarkCheckKeys(sizes = [10 ** 6, 10 ** 7]):
+    print('CheckKeys: seconds per check')
+    print('%12s %22s %10s %10s %10s' % ('rows', 'keys', 'groupby', 'hashed', 'sorted'))
+    for n_rows in sizes:
+        df = MakePanel(n_rows)
+        for keys in [['firm', 'year'], ['state', 'firm', 'year']]:
+            groupby_secs = min(timeit.repeat(lambda: CheckKeysGroupby(df, keys), 
+                                             number = 1, repeat = 3))
+            hashed_secs  = min(timeit.repeat(lambda: CheckKeys(df, keys), number = 1, repeat = 3))
+            sorted_secs  = min(timeit.repeat(lambda: CheckKeys(df, keys, sortbykey = True),
+                                             number = 1, repeat = 3))
+            print('%12d %22s %10.3f %10.3f %10.3f' % (n_rows, ' '.join(keys), groupby_secs, 
+                                                      hashed_secs, sorted_secs))
+
+
+def PrepareOriginal(df, keys):
+    # The original passes before writing: list checks, key checks, reordering, 
+    # hash and summary statistics
+    [any(df[col].apply(lambda x: type(x) == list)) for col in df.columns]
+    df[keys].isnull().any()
+    [any(df[keycol].apply(lambda x: type(x) == list)) for keycol in keys]
+    all(df.groupby(keys).size() == 1)
+    df = df[keys + [col for col in df.columns if col not in keys]]
+    hashlib.md5(pd.util.hash_pandas_object(df).values).hexdigest()
+    GetSummaryStats(df)
+
+
+def PrepareFused(df, keys):
+    # The same passes as run by SaveData with sortbykey = False
+    CheckColumnsNotList(df)
+    counts = df.count()
+    hashes = {}
+    CheckKeys(df, keys, False, counts, hashes, check_lists = False)
+    df = df[keys + [col for col in df.columns if col not in keys]]
+    GetHash(df, hashes)
+    GetSummaryStats(df, counts)
+
+
+def BenchmarkPrepare(sizes = [10 ** 6, 10 ** 7], max_original = 10 ** 7):
+    print('SaveData before writing: seconds')
+    print('%12s %10s %10s' % ('rows', 'original', 'fused'))
+    for n_rows in sizes:
+        df = MakePanel(n_rows)
+        keys = ['state', 'firm', 'year']
+        fused = min(timeit.repeat(lambda: PrepareFused(df, keys), number = 1, repeat = 3))
+        if n_rows <= max_original:
+            original = '%10.3f' % min(timeit.repeat(lambda: PrepareOriginal(df, keys), 
+                                                    number = 1, repeat = 1))
+        else:
+            original = '%10s' % '-'
+        print('%12d %s %10.3f' % (n_rows, original, fused))
+
+
+FORMATS = [('.csv', None, None), ('.dta', None, None), 
+           ('.parquet', 'none', None), ('.parquet', None, None), ('.parquet', 'zstd', None), 
+           ('.parquet', 'gzip', None), ('.feather', 'uncompressed', None), 
+           ('.feather', None, None), ('.feather', 'zstd', None), ('.feather', 'zstd', 9)]
+
+
+def BenchmarkFormats(sizes = [10 ** 6, 10 ** 7]):
+    print('SaveDf: seconds per write and file size')
+    print('%12s %10s %14s %10s %10s' % ('rows', 'format', 'compression', 'seconds', 'MB'))
+    for n_rows in sizes:
+        df = MakePanel(n_rows)
+        df['date'] = pd.to_datetime(df['year'].astype(str) + '-06-30')
+        keys = ['state', 'firm', 'year']
+        df = df[keys + [col for col in df.columns if col not in keys]]
+        with tempfile.TemporaryDirectory() as out_dir:
+            for extension, compression, level in FORMATS:
+                out_file = os.path.join(out_dir, 'df' + extension)
+                seconds = min(timeit.repeat(lambda: SaveDf(df, keys, out_file, False, extension, 
+                                                           None, compression, level), 
+                                            number = 1, repeat = 3))
+                label = (compression or 'default') + ('' if level is None else ' %d' % level)
+                print('%12d %10s %14s %10.3f %10.1f' % (n_rows, extension, label, seconds, 
+                                                        os.path.getsize(out_file) / 2 ** 20))
+
+
+def BenchmarkCsvWorkers(sizes = [10 ** 6, 10 ** 7], workers = [1, 2, 4, 8, 16, 32]):
+    print('CSV output: seconds per write with to_csv and with worker processes')
+    print('%12s %12s %10s %10s %10s' % ('rows', 'compression', 'workers', 'seconds', 'MB'))
+    for n_rows in sizes:
+        df = MakePanel(n_rows)
+        with tempfile.TemporaryDirectory() as out_dir:
+            out_file = os.path.join(out_dir, 'df.csv')
+            for compression in [None, 'gzip']:
+                if compression is None:
+                    seconds = min(timeit.repeat(lambda: df.to_csv(out_file, index = False), 
+                                                number = 1, repeat = 3))
+                    print('%12d %12s %10s %10.3f %10.1f' % (n_rows, 'none', 'to_csv', seconds, 
+                                                            os.path.getsize(out_file) / 2 ** 20))
+                for n_workers in workers:
+                    seconds = min(timeit.repeat(lambda: SaveCsvBlocks(df, out_file, n_workers, 
+                                                                      compression), 
+                                                number = 1, repeat = 3))
+                    print('%12d %12s %10d %10.3f %10.1f' % (n_rows, compression or 'none', n_workers,
+                                                            seconds, os.path.getsize(out_file) / 2 ** 20))
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]]
+    BenchmarkCheckKeys(*([sizes] if sizes else []))
+    BenchmarkPrepare(*([sizes] if sizes else []))
+    BenchmarkFormats(*([sizes] if sizes else []))
+    BenchmarkCsvWorkers(*([sizes] if sizes else []))
@@ -1,12 +1,17 @@
 import unittest
 import sys
 import pandas as pd
+import numpy as np
 import os
 from pathlib import Path
 
 sys.path.append('..')
 
-from SaveData import SaveData
+import hashlib
+import gzip
+import zlib
+from SaveData import SaveData, SaveDataChunked, GetHash, ReorderColumns
+SaveDataModule = sys.modules['SaveData']
 
 pd.set_option('future.no_silent_downcasting', True)
 
@@ -40,6 +45,23 @@ class TestSaveData(unittest.TestCase):
         with self.assertRaises(TypeError):
             SaveData(df, 'id', 'dfs.csv')    
             
+    def test_list_check_sampled(self):
+        df = pd.read_csv('data/data.csv')
+        df['list_column'] = df['id'].apply(lambda x: [x])
+        with self.assertRaises(TypeError):
+            SaveData(df, ['id'], 'dfs.csv', list_check = 'sampled')
+        with self.assertRaises(ValueError):
+            SaveData(df, ['id'], 'dfs.csv', list_check = 'none')
+
+    def test_list_check_column_types(self):
+        df = pd.read_csv('data/data.csv')
+        df['category'] = df['id'].astype(str).astype('category')
+        df['nullable'] = df['id'].astype('Int64')
+        df['mixed'] = df['id'].apply(lambda x: 'a' if x == 1 else x)
+        SaveData(df, ['id'], 'df.csv')
+        self.assertEqual(True, os.path.isfile('df.csv'))
+        os.remove('df.csv')
+            
     def test_key_on_left(self):
         df = pd.read_csv('data/data.csv')
         df['id2'] = df['id']
@@ -66,6 +88,150 @@ class TestSaveData(unittest.TestCase):
         with self.assertRaises(ValueError):
             SaveData(df, ['partid1'], 'dfs.csv')
 
+    def test_duplicate_keys_reported(self):
+        df = pd.DataFrame({'id': [3, 1, 2, 1, 3], 'year': [1, 1, 1, 1, 2]})
+        with self.assertRaisesRegex(ValueError, 'First duplicated keys: 1, 3.$'):
+            SaveData(df, ['id'], 'dfs.csv')
+        with self.assertRaisesRegex(ValueError, 'First duplicated keys: 3, 1.$'):
+            SaveData(df, ['id'], 'dfs.csv', sortbykey = False)
+        for sortbykey in [True, False]:
+            with self.assertRaisesRegex(ValueError, r'First duplicated keys: \(1, 1\).$'):
+                SaveData(df, ['id', 'year'], 'dfs.csv', sortbykey = sortbykey)
+
+    def test_duplicate_float_keys(self):
+        # The sorted and hashed checks agree on signed zeros and NaN
+        nan_bits = np.array([0x7ff8000000000001], dtype = np.uint64).view(np.float64)[0]
+        frames = [pd.DataFrame({'id': [0.0, -0.0], 'year': [1, 1]}),
+                  pd.DataFrame({'id': np.array([-0.0, 1.0, 0.0], dtype = np.float32)}),
+                  pd.DataFrame({'id': pd.array([0.0, -0.0], dtype = 'Float64')}),
+                  pd.DataFrame({'id': [np.nan, nan_bits], 'year': [1, 2]})]
+        for df in frames:
+            keys = ['id', 'year'] if 'year' in df.columns else ['id']
+            errors = []
+            for sortbykey in [True, False]:
+                with self.assertRaises(ValueError) as context:
+                    SaveData(df, keys, 'dfs.csv', sortbykey = sortbykey)
+                errors.append(str(context.exception))
+            self.assertEqual(errors[0], errors[1])
+        with self.assertRaisesRegex(ValueError, 'Keys do not uniquely identify'):
+            SaveDataChunked([pd.DataFrame({'id': [0.0]}), pd.DataFrame({'id': [-0.0]})], 
+                            ['id'], 'dfs.csv')
+        self.assertFalse(os.path.exists('dfs.csv'))
+
+    def test_hash_reuses_column_hashes(self):
+        df = pd.read_csv('data/data.csv')
+        df['category'] = df['id'].astype(str).astype('category')
+        df['date'] = pd.to_datetime(df['id'], unit = 'D')
+        df.index = df.index * 2
+        expected = hashlib.md5(pd.util.hash_pandas_object(df).values).hexdigest()
+        self.assertEqual(GetHash(df), expected)
+        self.assertEqual(GetHash(df, {}), expected)
+
+    def test_chunked_matches_in_memory(self):
+        df = pd.read_csv('data/data.csv')
+        df['date'] = pd.to_datetime(df['id'], unit = 'D')
+        SaveData(df, ['name', 'id'], 'df.csv', 'df.log', sortbykey = False)
+        chunks = [df.iloc[start:start + 3] for start in range(0, len(df), 3)]
+        SaveDataChunked(iter(chunks), ['name', 'id'], 'df_chunked.csv', 'df_chunked.log')
+        with open('df.csv') as f, open('df_chunked.csv') as f_chunked:
+            self.assertEqual(f.read(), f_chunked.read())
+        with open('df.log') as f, open('df_chunked.log') as f_chunked:
+            log, log_chunked = f.read(), f_chunked.read()
+        self.assertEqual(log.split('\n')[1:5], log_chunked.split('\n')[1:5])
+        self.assertIn('510.0', log_chunked)
+        self.assertIn('1496.258333', log_chunked)
+        for file in ['df.csv', 'df.log', 'df_chunked.csv', 'df_chunked.log']:
+            os.remove(file)
+
+    def test_chunked_duplicate_keys(self):
+        df = pd.read_csv('data/data.csv')
+        df = pd.concat([df, df.iloc[[7, 2]]], ignore_index = True)
+        chunks = [df.iloc[start:start + 4] for start in range(0, len(df), 4)]
+        with self.assertRaisesRegex(ValueError, 'First duplicated keys: 3, 8.$'):
+            SaveDataChunked(chunks, ['id'], 'df.csv')
+        self.assertEqual(False, os.path.isfile('df.csv'))
+        with self.assertRaises(ValueError):
+            SaveDataChunked(chunks, ['id'], 'df.dta')
+
+    def test_unordered_hash(self):
+        df = pd.read_csv('data/data.csv')
+        df_shuffled = df.sample(frac = 1, random_state = 0)
+        self.assertNotEqual(GetHash(df), GetHash(df_shuffled))
+        self.assertEqual(GetHash(df, hash_mode = 'unordered'), 
+                         GetHash(df_shuffled, {}, hash_mode = 'unordered'))
+        df_changed = df.copy()
+        df_changed.loc[0, 'num'] = 11
+        self.assertNotEqual(GetHash(df, hash_mode = 'unordered'), 
+                            GetHash(df_changed, hash_mode = 'unordered'))
+        chunks = [df_shuffled.iloc[start:start + 4] for start in range(0, len(df), 4)]
+        SaveDataChunked(chunks, ['id'], 'df.csv', 'df.log', hash_mode = 'unordered')
+        with open('df.log') as f:
+            expected = GetHash(ReorderColumns(df, ['id']), hash_mode = 'unordered')
+            self.assertIn('MD5 hash: %s' % expected, f.read())
+        with self.assertRaises(ValueError):
+            SaveData(df, ['id'], 'df.csv', hash_mode = 'sorted')
+        os.remove('df.csv')
+        os.remove('df.log')
+
+    def test_skip_unchanged(self):
+        df = pd.read_csv('data/data.csv')
+        SaveData(df, ['id'], 'df.csv', 'df.log', hash_mode = 'unordered', skip_unchanged = True)
+        with open('df.log') as f:
+            log = f.read()
+        modified = os.stat('df.csv').st_mtime_ns
+        
+        SaveData(df.sample(frac = 1, random_state = 0), ['id'], 'df.csv', 'df.log', 
+                 hash_mode = 'unordered', skip_unchanged = True)
+        self.assertEqual(modified, os.stat('df.csv').st_mtime_ns)
+        with open('df.log') as f:
+            self.assertEqual(log, f.read())
+        
+        df.loc[0, 'num'] = 11
+        SaveData(df, ['id'], 'df.csv', 'df.log', hash_mode = 'unordered', skip_unchanged = True)
+        self.assertNotEqual(modified, os.stat('df.csv').st_mtime_ns)
+        self.assertEqual(11, pd.read_csv('df.csv').loc[0, 'num'])
+        with self.assertRaises(ValueError):
+            SaveData(df, ['id'], 'df.csv', 'df.log', sortbykey = False, 
+                     hash_mode = 'unordered', skip_unchanged = True)
+        for file in ['df.csv', 'df.log', 'df.log.cache']:
+            os.remove(file)
+
+    def test_skip_unchanged_columns_and_dtypes(self):
+        df = pd.read_csv('data/data.csv')
+        SaveData(df, ['id'], 'df.parquet', 'df.log', skip_unchanged = True)
+        modified = os.stat('df.parquet').st_mtime_ns
+        
+        df = df.rename(columns = {'num': 'value'})
+        SaveData(df, ['id'], 'df.parquet', 'df.log', skip_unchanged = True)
+        self.assertNotEqual(modified, os.stat('df.parquet').st_mtime_ns)
+        self.assertIn('value', pd.read_parquet('df.parquet').columns)
+        modified = os.stat('df.parquet').st_mtime_ns
+        
+        df['name'] = df['name'].astype('category')
+        SaveData(df, ['id'], 'df.parquet', 'df.log', skip_unchanged = True)
+        self.assertNotEqual(modified, os.stat('df.parquet').st_mtime_ns)
+        self.assertEqual('category', str(pd.read_parquet('df.parquet')['name'].dtype))
+        
+        df['list_column'] = df['id'].apply(lambda x: [x])
+        with self.assertRaisesRegex(TypeError, 'No column can be of type list'):
+            SaveData(df, ['id'], 'df.parquet', 'df.log', skip_unchanged = True)
+        for file in ['df.parquet', 'df.log', 'df.log.cache']:
+            os.remove(file)
+
+    def test_repeated_column_names(self):
+        df = pd.read_csv('data/data.csv')[['id', 'name', 'num']]
+        df.columns = ['id', 'value', 'value']
+        SaveData(df, ['id'], 'df.csv', 'df.log')
+        with open('df.log') as f:
+            log = f.read()
+        self.assertIn('value', log)
+        self.assertEqual(pd.read_csv('df.csv').shape[0], df.shape[0])
+        with self.assertRaises(ValueError):
+            SaveDataChunked([df], ['id'], 'df_chunked.csv')
+        self.assertFalse(os.path.exists('df_chunked.csv'))
+        os.remove('df.csv')
+        os.remove('df.log')
+
     def test_multiple_keys(self):
         df = pd.read_csv('data/data.csv')
         SaveData(df, ['id', 'partid1','partid2'], 'df.csv')
@@ -80,6 +246,80 @@ class TestSaveData(unittest.TestCase):
         self.assertEqual(True, df.compare(df_saved).shape==(0,0))
         os.remove('df.dta')
                 
+    def test_saves_desired_file_parquet(self):
+        df = pd.read_csv('data/data.csv')
+        for compression in [None, 'zstd', 'none']:
+            SaveData(df, ['id'], 'df.parquet', compression = compression)
+            df_saved = pd.read_parquet('df.parquet')
+            self.assertEqual(True, df.compare(df_saved).shape==(0,0))
+            os.remove('df.parquet')
+
+    def test_saves_desired_file_feather(self):
+        df = pd.read_csv('data/data.csv')
+        SaveData(df, ['partid1', 'partid2'], 'df.feather', compression = 'zstd', 
+                 compression_level = 3)
+        df_saved = pd.read_feather('df.feather')
+        df_sorted = df.sort_values(['partid1', 'partid2'], ignore_index = True)
+        self.assertEqual(True, df_sorted[df_saved.columns].compare(df_saved).shape==(0,0))
+        os.remove('df.feather')
+        with self.assertRaises(ValueError):
+            SaveData(df, ['id'], 'df.dta', compression = 'gzip')
+
+    def test_saves_csv_in_parallel(self):
+        df = pd.read_csv('data/data.csv')
+        df['date'] = pd.to_datetime(df['id'], unit = 'D')
+        SaveData(df, ['id'], 'df.csv')
+        SaveData(df, ['id'], 'df_parallel.csv', csv_workers = 2)
+        with open('df.csv', 'rb') as f, open('df_parallel.csv', 'rb') as f_parallel:
+            self.assertEqual(f.read(), f_parallel.read())
+        SaveData(df, ['id'], 'df_parallel.csv', csv_workers = 2, compression = 'gzip')
+        with open('df.csv', 'rb') as f, gzip.open('df_parallel.csv', 'rb') as f_parallel:
+            self.assertEqual(f.read(), f_parallel.read())
+        with self.assertRaises(ValueError):
+            SaveData(df, ['id'], 'df.csv', compression = 'bz2')
+        os.remove('df.csv')
+        os.remove('df_parallel.csv')
+
+    def test_saves_csv_in_blocks(self):
+        # Blocks of three rows, so that the ten rows are written in four blocks
+        df = pd.read_csv('data/data.csv').sample(frac = 1, random_state = 0)
+        df['date'] = pd.to_datetime(df['id'], unit = 'D')
+        chunk_cells, block_chunks = SaveDataModule.CSV_CHUNK_CELLS, SaveDataModule.CSV_BLOCK_CHUNKS
+        SaveDataModule.CSV_CHUNK_CELLS, SaveDataModule.CSV_BLOCK_CHUNKS = df.shape[1], 3
+        try:
+            SaveData(df, ['id'], 'df.csv')
+            with open('df.csv', 'rb') as f:
+                expected = f.read()
+            self.assertEqual(list(pd.read_csv('df.csv')['id']), sorted(df['id']))
+            compressions = [None, 'gzip'] + (['zstd'] if SaveDataModule.zstandard else [])
+            for compression in compressions:
+                SaveData(df, ['id'], 'df_serial.csv', compression = compression)
+                SaveData(df, ['id'], 'df_parallel.csv', compression = compression, 
+                         csv_workers = 2)
+                with open('df_serial.csv', 'rb') as f, open('df_parallel.csv', 'rb') as f_parallel:
+                    data = f.read()
+                    self.assertEqual(data, f_parallel.read())
+                # Compressed output holds one gzip member or zstd frame per block
+                if compression == 'gzip':
+                    self.assertEqual(gzip.decompress(data), expected)
+                    members, rest = 0, data
+                    while rest:
+                        decompressor = zlib.decompressobj(31)
+                        decompressor.decompress(rest)
+                        rest, members = decompressor.unused_data, members + 1
+                    self.assertEqual(members, 4)
+                elif compression == 'zstd':
+                    decompressor = SaveDataModule.zstandard.ZstdDecompressor()
+                    with decompressor.stream_reader(data, read_across_frames = True) as reader:
+                        self.assertEqual(reader.read(), expected)
+                    self.assertLess(len(decompressor.decompress(data)), len(expected))
+                else:
+                    self.assertEqual(data, expected)
+        finally:
+            SaveDataModule.CSV_CHUNK_CELLS, SaveDataModule.CSV_BLOCK_CHUNKS = chunk_cells, block_chunks
+        for file in ['df.csv', 'df_serial.csv', 'df_parallel.csv']:
+            os.remove(file)
+                
     def test_saves_desired_file_without_log(self):
         df = pd.read_csv('data/data.csv')
         SaveData(df, ['id'], 'df.csv')
@@ -1,10 +1,42 @@
 #!/usr/bin/env python
 import os
+import bz2
+import hashlib
+import json
+import multiprocessing
 import shutil
+import struct
+import time
 import zipfile
 import zlib
 from abc import ABCMeta, abstractmethod
 
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# Bytes read at a time when streaming files into output zips
+READ_SIZE = 1024 * 1024
+
+# File in path_out recording the inputs of each output zip in incremental runs
+MANIFEST_NAME = 'manifest.json'
+
+# Compression methods of output .zip files. Python 2's zipfile can only write and 
+# read stored and deflated entries, so bzip2 and lzma entries are written by 
+# writeEntry, in the format used by Python 3's zipfile and 7-Zip.
+ZIP_BZIP2 = 12
+ZIP_LZMA = 14
+COMPRESSION_TYPES = {'stored': zipfile.ZIP_STORED, 'deflate': zipfile.ZIP_DEFLATED,
+                     'bzip2': ZIP_BZIP2, 'lzma': ZIP_LZMA}
+
+# Named (compression, compression_level) settings. 'fast' suits intermediate 
+# output that is read again soon, trading size for speed.
+COMPRESSION_PROFILES = {'fast': ('deflate', 1)}
+
 class gencat(object):
     '''
     Tool for concatenating text files stored in .zip files
@@ -20,32 +52,94 @@ class gencat(object):
             by the class's main method.
         - path_out: the path to the directory to which a gencat object will save
             its final output. 
+
+    With main(streaming = True) nothing is extracted to path_temp. The input .zip 
+    files are indexed instead, and the files listed in concat_dict are read from 
+    them as the output .zip files are written. makeConcatDict should then name 
+    files by the paths they would be extracted to under path_temp, which are the 
+    keys of self.zip_members.
+
+    With main(incremental = True) path_out is kept between runs, along with a 
+    manifest of the inputs each output .zip file was built from. Only output .zip 
+    files whose entries in zip_dict and concat_dict, or whose input files, have 
+    changed are rebuilt, and a run that stopped part way resumes after the last
+    output .zip file it completed. As with streaming, makeConcatDict should name
+    files by the keys of self.zip_members.
+
+    The optional arguments compression and compression_level set how the output
+    .zip files are compressed. compression is one of 'stored', 'deflate' (the 
+    default), 'bzip2' and 'lzma', or the name of a profile in COMPRESSION_PROFILES
+    such as 'fast'. compression_level is passed to the compressor and defaults to 
+    its own default. Python 2's zipfile cannot read bzip2 and lzma entries. Python 
+    3's zipfile and 7-Zip read both, and unzip reads bzip2 but usually not lzma, 
+    so bzip2 is the more portable choice. lzma requires backports.lzma under 
+    Python 2.
     '''
 
     __metaclass__ = ABCMeta
     
-    def __init__(self, path_in, path_temp, path_out):
+    def __init__(self, path_in, path_temp, path_out, compression = 'deflate', 
+                 compression_level = None):
         self.path_in = os.path.join(path_in, '')
         self.path_temp = os.path.join(path_temp, '')
         self.path_out = os.path.join(path_out, '')
+        if compression in COMPRESSION_PROFILES:
+            compression, profile_level = COMPRESSION_PROFILES[compression]
+            if compression_level is None:
+                compression_level = profile_level
+        if compression not in COMPRESSION_TYPES:
+            raise ValueError('Unknown compression %r, expected one of %s' % 
+                             (compression, ', '.join(sorted(COMPRESSION_TYPES.keys() + 
+                                                            COMPRESSION_PROFILES.keys()))))
+        if compression == 'lzma' and lzma is None:
+            raise RuntimeError('lzma compression requires the lzma module (backports.lzma)')
+        self.compression = compression
+        self.compression_level = compression_level
+        self.compress_type = COMPRESSION_TYPES[compression]
         self.concat_dict = {}
         self.zip_dict = {}
+        self.zip_members = {}
+        self.manifest = {}
+        self.zip_digests = {}
 
     
-    def main(self):
+    def main(self, streaming = False, processes = None, selective = False, incremental = False):
         '''
         Run all methods in order to produce fresh output. 
         Begins by wiping the path_temp and path_out directories.
+        With streaming = True the input .zip files are indexed rather than unzipped,
+        and concatenated files are streamed into the output .zip files.
+        With selective = True the input .zip files are indexed, and only the files 
+        named in concat_dict are unzipped once it is made.
+        With processes > 1 the input .zip files are unzipped and the output .zip 
+        files are built in parallel.
+        With incremental = True path_out is not wiped, and only the output .zip files
+        whose inputs have changed are rebuilt (see staleZips), unzipping selectively
+        unless streaming.
         '''
         self.cleanDir(self.path_temp)
-        self.cleanDir(self.path_out)
-        self.unzipFiles()
+        if not incremental:
+            self.cleanDir(self.path_out)
+        elif not os.path.isdir(self.path_out):
+            os.makedirs(self.path_out)
+        if streaming or selective or incremental:
+            self.indexZips()
+        else:
+            self.unzipFiles(processes = processes)
         self.makeConcatDict()
         self.makeZipDict()
         self.checkDicts()
+        zip_keys = self.staleZips() if incremental else sorted(self.zip_dict.keys())
+        if (selective or incremental) and not streaming:
+            members = [val for zip_key in zip_keys for zip_val in self.zip_dict[zip_key]
+                       for val in self.concat_dict[zip_val]]
+            self.unzipFiles(members, processes)
         self.writeDict(self.concat_dict, 'concatDict.txt', self.path_temp)
         self.writeDict(self.zip_dict, 'zipDict.txt', '.')
-        self.zipFiles()
+        if incremental:
+            self.zipFiles(streaming, processes, zip_keys, self.recordZip)
+        else:
+            self.zipFiles(streaming, processes)
         self.cleanDir(self.path_temp, new_dir = False)
     
 
@@ -59,10 +153,18 @@ class gencat(object):
             if new_dir != False:
                 os.makedirs(path)
     
-    def unzipFiles(self):
+    def unzipFiles(self, members = None, processes = None):
         '''
         Unzips files from path_in to path_temp
+        If members is given, only the files in it that are in self.zip_members are
+        unzipped. With processes > 1, the .zip files are unzipped in parallel. Both
+        use the index made by indexZips, so that each file is unzipped once, from 
+        the .zip file it would finally be unzipped from otherwise. Directories 
+        holding no files are then not created.
         '''
+        if members is not None or (processes is not None and processes > 1):
+            return self.unzipMembers(members, processes)
+        
         infilenames = os.listdir(self.path_in)
         
         for infilename in infilenames:
@@ -72,6 +174,64 @@ class gencat(object):
                 with zipfile.ZipFile(infile, 'r') as zf:
                     zf.extractall(self.path_temp)
     
+    def unzipMembers(self, members = None, processes = None):
+        '''
+        Unzips the files in members, or all files in self.zip_members, grouped by
+        .zip file. See unzipFiles.
+        '''
+        if not self.zip_members:
+            self.indexZips()
+        if members is None:
+            paths = self.zip_members.keys()
+        else:
+            paths = [os.path.normpath(member) for member in members]
+            paths = [path for path in paths if path in self.zip_members]
+        
+        names = {}
+        dirs = set()
+        for path in sorted(set(paths)):
+            infile, name = self.zip_members[path][:2]
+            names.setdefault(infile, []).append(name)
+            dirs.add(os.path.dirname(path))
+        # Made here so that processes unzipping to the same directory do not race
+        for directory in sorted(dirs):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        
+        jobs = [(infile, names[infile], self.path_temp) for infile in sorted(names)]
+        if processes is not None and processes > 1 and len(jobs) > 1:
+            poolMap(unzipWorker, jobs, processes)
+        else:
+            for job in jobs:
+                unzipWorker(job)
+    
+    def indexZips(self):
+        '''
+        Maps the path each file in the .zip files in path_in would be unzipped to
+        in path_temp to its .zip file, name in the .zip file, size and CRC. As when
+        unzipping, a file in a later .zip file replaces one of the same name.
+        '''
+        self.zip_members = {}
+        infilenames = os.listdir(self.path_in)
+        
+        for infilename in infilenames:
+            infile = os.path.join(self.path_in, infilename)
+            
+            if zipfile.is_zipfile(infile):
+                with zipfile.ZipFile(infile, 'r') as zf:
+                    for info in zf.infolist():
+                        if info.filename.endswith('/'):
+                            continue
+                        # Sanitised as in ZipFile.extract
+                        arcname = info.filename.replace('/', os.path.sep)
+                        if os.path.altsep:
+                            arcname = arcname.replace(os.path.altsep, os.path.sep)
+                        arcname = os.path.splitdrive(arcname)[1]
+                        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
+                                                   if x not in ('', os.path.curdir, os.path.pardir))
+                        path = os.path.normpath(os.path.join(self.path_temp, arcname))
+                        self.zip_members[path] = (infile, info.filename, info.file_size, info.CRC)
+    
     @abstractmethod
     def makeConcatDict(self):
         '''
@@ -119,36 +279,355 @@ class gencat(object):
                 outfile.write('\n')
     
     
-    def zipFiles(self):
+    def staleZips(self):
+        '''
+        Returns the keys of zip_dict whose output .zip files need to be built, as
+        they are missing or their inputs differ from those in the manifest. Their
+        output .zip files are removed, as are output .zip files in the manifest 
+        whose keys are no longer in zip_dict.
+        '''
+        self.manifest = self.readManifest()
+        self.zip_digests = dict((zip_key, self.zipDigest(zip_key)) for zip_key in self.zip_dict)
+        zips = self.manifest['zips']
+        
+        stale = [zip_key for zip_key in sorted(self.zip_dict.keys())
+                 if zips.get(zip_key) != self.zip_digests[zip_key] or 
+                 not os.path.isfile(os.path.join(self.path_out, zip_key + '.zip'))]
+        removed = [zip_key for zip_key in zips if zip_key not in self.zip_dict]
+        for zip_key in stale + removed:
+            outzippath = os.path.join(self.path_out, zip_key + '.zip')
+            if os.path.isfile(outzippath):
+                os.remove(outzippath)
+            zips.pop(zip_key, None)
+        self.writeManifest()
+        return stale
+    
+    def zipDigest(self, zip_key):
+        '''
+        MD5 hash of the zip_dict and concat_dict entries for zip_key, the compression
+        settings, and the size and CRC of each file, as recorded in its .zip file, 
+        or the size and modification time of files not in .zip files.
+        '''
+        entries = [zip_key, self.compression, self.compression_level]
+        for zip_val in self.zip_dict[zip_key]:
+            files = []
+            for concat_val in self.concat_dict[zip_val]:
+                member = self.zip_members.get(os.path.normpath(concat_val))
+                if member is None:
+                    stat = os.stat(concat_val)
+                    files.append([concat_val, stat.st_size, stat.st_mtime])
+                else:
+                    files.append([concat_val, member[2], member[3]])
+            entries.append([zip_val, files])
+        return hashlib.md5(json.dumps(entries)).hexdigest()
+    
+    def readManifest(self):
+        try:
+            with open(os.path.join(self.path_out, MANIFEST_NAME), 'rb') as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            manifest = {}
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('zips'), dict):
+            manifest = {'zips': {}}
+        return manifest
+    
+    def writeManifest(self):
+        '''
+        Writes the manifest to a temporary file and renames it, so that a run 
+        stopping part way never leaves a partial manifest.
+        '''
+        manifestpath = os.path.join(self.path_out, MANIFEST_NAME)
+        with open(manifestpath + '.tmp', 'wb') as f:
+            json.dump(self.manifest, f, indent = 1, sort_keys = True)
+        try:
+            os.rename(manifestpath + '.tmp', manifestpath)
+        except OSError:
+            # Windows does not allow renaming onto an existing file
+            os.remove(manifestpath)
+            os.rename(manifestpath + '.tmp', manifestpath)
+    
+    def recordZip(self, zip_key):
+        '''
+        Records in the manifest that the output .zip file for zip_key is complete.
+        '''
+        self.manifest['zips'][zip_key] = self.zip_digests[zip_key]
+        self.writeManifest()
+    
+    def zipFiles(self, streaming = False, processes = None, zip_keys = None, callback = None):
         '''
         Concatenates all files in a dictionary values to a new file named for the corresponding key.
         Files are concatenated in the order in which they appear in the dictionary value. 
         Places NEWFILE\nFILENAME: <original filename> before each new file in the concatenation.
         Stores all concatenated files to .zip file(s) with ZIP64 compression in path_out.
+        With streaming = True, see streamZipFile.
+        With processes > 1, up to that many .zip files are built at once in a pool of 
+        processes. Each .zip file is built by one process exactly as it would be serially.
+        If given, only the .zip files for zip_keys are built, and callback is called 
+        with each key once its .zip file is complete.
         '''
-        for zip_key in self.zip_dict.keys():
-            catdirpath = os.path.join(self.path_temp, zip_key, '')
-            os.makedirs(catdirpath)
-            inzippath = os.path.join('..', zip_key, '')
-            self.cleanDir(inzippath)
+        if zip_keys is None:
+            zip_keys = sorted(self.zip_dict.keys())
+        if processes is not None and processes > 1 and len(zip_keys) > 1:
+            return poolMap(zipWorker, zip_keys, processes, initZipWorker, (self, streaming), 
+                           callback)
+        
+        readers = {}
+        try:
+            for zip_key in zip_keys:
+                self.zipFile(zip_key, streaming, readers)
+                if callback is not None:
+                    callback(zip_key)
+        finally:
+            for reader in readers.values():
+                reader.close()
+
+    def zipFile(self, zip_key, streaming = False, readers = None):
+        '''
+        Builds the .zip file for zip_key as described in zipFiles. readers holds the 
+        input .zip files opened so far when streaming.
+        '''
+        if streaming:
+            return self.streamZipFile(zip_key, {} if readers is None else readers)
+        
+        catdirpath = os.path.join(self.path_temp, zip_key, '')
+        os.makedirs(catdirpath)
+        inzippath = os.path.join('..', zip_key, '')
+        self.cleanDir(inzippath)
 
-            outzipname = zip_key + '.zip'
-            outzippath = os.path.join(self.path_out, outzipname)
-            zf         = zipfile.ZipFile(outzippath, 'a', zipfile.ZIP_DEFLATED, True)
+        outzipname = zip_key + '.zip'
+        outzippath = os.path.join(self.path_out, outzipname)
+        zf         = self.openZip(outzippath)
+        
+        for zip_val in self.zip_dict[zip_key]:
+            catfilename = zip_val + '.txt'
+            catfilepath = os.path.join(catdirpath, catfilename)
+            with open(catfilepath, 'ab') as catfile:
+                concat_key = zip_val 
+                for concat_val in self.concat_dict[concat_key]:
+                    catfile.write('\nNEWFILE\nFILENAME: %s\n\n' % (os.path.basename(concat_val)))
+                    with open(concat_val, 'rU') as f:
+                        for line in f:
+                            catfile.write(line)
             
+            inzipfile = os.path.join(inzippath, catfilename) 
+            shutil.copyfile(catfilepath, inzipfile)
+            if self.compression == 'deflate' and self.compression_level is None:
+                zf.write(inzipfile)
+            else:
+                self.writeEntry(zf, inzipfile, readBlocks(inzipfile), 
+                                os.path.getsize(inzipfile))
+    
+        self.cleanDir(inzippath, new_dir = False)
+
+    def streamZipFile(self, zip_key, readers):
+        '''
+        Writes the same .zip file as zipFile without staging any files on disk.
+        Files in self.zip_members are read from the input .zip files, and other 
+        files from disk, with universal newlines as in zipFile. The concatenation
+        is written directly into the entry of the output .zip file.
+        '''
+        outzipname = zip_key + '.zip'
+        outzippath = os.path.join(self.path_out, outzipname)
+        with self.openZip(outzippath) as zf:
             for zip_val in self.zip_dict[zip_key]:
                 catfilename = zip_val + '.txt'
-                catfilepath = os.path.join(catdirpath, catfilename)
-                with open(catfilepath, 'ab') as catfile:
-                    concat_key = zip_val 
-                    for concat_val in self.concat_dict[concat_key]:
-                        catfile.write('\nNEWFILE\nFILENAME: %s\n\n' % (os.path.basename(concat_val)))
-                        with open(concat_val, 'rU') as f:
-                            for line in f:
-                                catfile.write(line)
-                
-                inzipfile = os.path.join(inzippath, catfilename) 
-                shutil.copyfile(catfilepath, inzipfile)
-                zf.write(inzipfile)
+                inzipfile = os.path.join('..', zip_key, catfilename)
+                self.writeEntry(zf, inzipfile, self.streamConcat(zip_val, readers),
+                                self.concatSize(zip_val))
+    
+    def streamConcat(self, concat_key, readers):
+        '''
+        Yields the concatenation of the files in concat_dict[concat_key] in blocks.
+        readers holds the input .zip files opened so far.
+        '''
+        for concat_val in self.concat_dict[concat_key]:
+            yield '\nNEWFILE\nFILENAME: %s\n\n' % (os.path.basename(concat_val))
+            member = self.zip_members.get(os.path.normpath(concat_val))
+            if member is None:
+                f = open(concat_val, 'rb')
+            else:
+                if member[0] not in readers:
+                    readers[member[0]] = zipfile.ZipFile(member[0], 'r')
+                f = readers[member[0]].open(member[1])
+            
+            # Translate \r\n and \r to \n as files opened with 'rU' do, holding 
+            # back a \r at the end of a block until the next block is read
+            with f:
+                carry = ''
+                while True:
+                    buf = f.read(READ_SIZE)
+                    if not buf:
+                        break
+                    buf = carry + buf
+                    carry = '\r' if buf.endswith('\r') else ''
+                    if carry:
+                        buf = buf[:-1]
+                    yield buf.replace('\r\n', '\n').replace('\r', '\n')
+                if carry:
+                    yield '\n'
+    
+    def concatSize(self, concat_key):
+        '''
+        Upper bound on the size of the concatenation of concat_dict[concat_key]
+        '''
+        size = 0
+        for concat_val in self.concat_dict[concat_key]:
+            size += len('\nNEWFILE\nFILENAME: %s\n\n' % (os.path.basename(concat_val)))
+            member = self.zip_members.get(os.path.normpath(concat_val))
+            size += os.path.getsize(concat_val) if member is None else member[2]
+        return size
+    
+    def openZip(self, outzippath):
+        '''
+        Opens the output .zip file outzippath for appending. Entries compressed
+        with methods Python 2's zipfile lacks are added by writeEntry.
+        '''
+        if self.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return zipfile.ZipFile(outzippath, 'a', self.compress_type, True)
+        return zipfile.ZipFile(outzippath, 'a', zipfile.ZIP_STORED, True)
+
+    def compressor(self):
+        '''
+        Returns a new compressor for an entry of an output .zip file, with 
+        compress and flush methods, or None for stored entries.
+        '''
+        level = self.compression_level
+        if self.compression == 'deflate':
+            return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level,
+                                    zlib.DEFLATED, -15)
+        elif self.compression == 'bzip2':
+            return bz2.BZ2Compressor(9 if level is None else level)
+        elif self.compression == 'lzma':
+            return LZMACompressor(level)
+        return None
+
+    def writeEntry(self, zf, arcname, data, size):
+        '''
+        Writes the blocks of data to the open ZipFile zf as the file arcname.
+        Python 2 cannot open an entry of a ZipFile for writing, so this follows
+        ZipFile.write, with size in place of the size of the file on disk.
+        '''
+        arcname = os.path.normpath(os.path.splitdrive(arcname)[1])
+        while arcname[0] in (os.sep, os.altsep):
+            arcname = arcname[1:]
+        zinfo = zipfile.ZipInfo(arcname, time.localtime(time.time())[0:6])
+        zinfo.external_attr = (0o100644 & 0xFFFF) << 16
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.file_size = size
+        zinfo.flag_bits = 0x00
+        zinfo.header_offset = zf.fp.tell()
+        
+        # _writecheck rejects methods other than stored and deflated
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zinfo.compress_type = self.compress_type
+        if self.compress_type == ZIP_BZIP2:
+            zinfo.extract_version = zinfo.create_version = 46
+        elif self.compress_type == ZIP_LZMA:
+            # The end of the compressed data is marked
+            zinfo.extract_version = zinfo.create_version = 63
+            zinfo.flag_bits |= 0x02
         
-            self.cleanDir(inzippath, new_dir = False)
+        # Must overwrite CRC and sizes with correct data later
+        zinfo.CRC = CRC = 0
+        zinfo.compress_size = compress_size = 0
+        zip64 = zf._allowZip64 and size * 1.05 > zipfile.ZIP64_LIMIT
+        zf.fp.write(zinfo.FileHeader(zip64))
+        cmpr = self.compressor()
+        file_size = 0
+        for buf in data:
+            file_size = file_size + len(buf)
+            CRC = zlib.crc32(buf, CRC) & 0xffffffff
+            if cmpr:
+                buf = cmpr.compress(buf)
+                compress_size = compress_size + len(buf)
+            zf.fp.write(buf)
+        if cmpr:
+            buf = cmpr.flush()
+            compress_size = compress_size + len(buf)
+            zf.fp.write(buf)
+            zinfo.compress_size = compress_size
+        else:
+            zinfo.compress_size = file_size
+        zinfo.CRC = CRC
+        zinfo.file_size = file_size
+        if not zip64 and zf._allowZip64:
+            if file_size > zipfile.ZIP64_LIMIT:
+                raise RuntimeError('File size has increased during compressing')
+            if compress_size > zipfile.ZIP64_LIMIT:
+                raise RuntimeError('Compressed size larger than uncompressed size')
+        # Seek backwards and write file header (which will now include
+        # correct CRC and file sizes)
+        position = zf.fp.tell()
+        zf.fp.seek(zinfo.header_offset, 0)
+        zf.fp.write(zinfo.FileHeader(zip64))
+        zf.fp.seek(position, 0)
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+
+
+class LZMACompressor(object):
+    '''
+    Compresses an lzma entry of a .zip file: a header with the version of the 
+    LZMA SDK and the encoded properties, then raw LZMA1 data, as in Python 3's 
+    zipfile. level is the lzma preset.
+    '''
+    def __init__(self, level = None):
+        lzma_filter = {'id': lzma.FILTER_LZMA1}
+        if level is not None:
+            lzma_filter['preset'] = level
+        props = lzma._encode_filter_properties(lzma_filter)
+        self.header = struct.pack('<BBH', 9, 4, len(props)) + props
+        self.compressobj = lzma.LZMACompressor(lzma.FORMAT_RAW, filters = [lzma_filter])
+
+    def compress(self, data):
+        header, self.header = self.header, ''
+        return header + self.compressobj.compress(data)
+
+    def flush(self):
+        header, self.header = self.header, ''
+        return header + self.compressobj.flush()
+
+
+def readBlocks(path):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), ''):
+            yield block
+
+
+def poolMap(function, jobs, processes, initializer = None, initargs = (), callback = None):
+    '''
+    Runs function on each job in a pool of up to processes processes, raising 
+    the first error of any job. callback, if given, is called with the result
+    of each job as it completes.
+    '''
+    pool = multiprocessing.Pool(min(processes, len(jobs)), initializer, initargs)
+    try:
+        for result in pool.imap_unordered(function, jobs, chunksize = 1):
+            if callback is not None:
+                callback(result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def unzipWorker(job):
+    infile, names, path = job
+    with zipfile.ZipFile(infile, 'r') as zf:
+        for name in names:
+            zf.extract(name, path)
+
+# Worker processes of gencat.zipFiles receive the gencat object once, when they 
+# start, rather than with every .zip file they build
+zip_worker = {}
+
+def initZipWorker(cat, streaming):
+    zip_worker['cat'] = cat
+    zip_worker['streaming'] = streaming
+    zip_worker['readers'] = {}
+
+def zipWorker(zip_key):
+    zip_worker['cat'].zipFile(zip_key, zip_worker['streaming'], zip_worker['readers'])
+    return zip_key
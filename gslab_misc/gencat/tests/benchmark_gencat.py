@@ -0,0 +1,169 @@
+#! /usr/bin/env python
+'''
+Benchmarks for `gencat`. Run with
+`python benchmark_gencat.py`
+from `gencat/tests/`.
+'''
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import timeit
+import warnings
+import zipfile
+
+sys.path.append('../')
+
+import gencat as gencat_module
+from gencat import gencat
+
+
+class BenchmarkCat(gencat):
+    '''
+    Concatenates the files of the input zips into n_concat files in n_zips zips, 
+    using one in every_nth files
+    '''
+    def __init__(self, path_in, path_temp, path_out, n_concat, n_zips, every_nth = 1, 
+                 compression = 'deflate', compression_level = None):
+        gencat.__init__(self, path_in, path_temp, path_out, compression, compression_level)
+        self.n_concat = n_concat
+        self.n_zips = n_zips
+        self.every_nth = every_nth
+
+    def makeConcatDict(self):
+        if self.zip_members:
+            paths = sorted(self.zip_members.keys())
+        else:
+            paths = sorted(os.path.join(root, name) for root, dirs, names in os.walk(self.path_temp)
+                           for name in names)
+        paths = paths[::self.every_nth]
+        self.concat_dict = dict(('concat%d' % n, tuple(paths[n::self.n_concat]))
+                                for n in range(self.n_concat))
+
+    def makeZipDict(self):
+        self.zip_dict = dict(('zip%d' % n, tuple('concat%d' % m for m in
+                                                 range(n, self.n_concat, self.n_zips)))
+                             for n in range(self.n_zips))
+
+
+def make_corpus(path_in, n_files, n_lines = 1000, n_archives = 4):
+    '''n_files text files of n_lines lines each, spread over n_archives zips'''
+    random.seed(0)
+    words = ['word%d' % n for n in range(5000)]
+    lines = [' '.join(random.sample(words, 12)) + '\r\n' for n in range(20000)]
+    os.makedirs(path_in)
+    for n in range(n_archives):
+        with zipfile.ZipFile(os.path.join(path_in, 'input%d.zip' % n), 'w',
+                             zipfile.ZIP_DEFLATED, True) as zf:
+            for m in range(n, n_files, n_archives):
+                zf.writestr('docs/doc%d.txt' % m, ''.join(random.sample(lines, n_lines)))
+
+
+def benchmark_zipFiles(file_counts = [400, 1600], processes = [1, 2, 4, 8], n_zips = 16):
+    '''Streaming builds of n_zips output zips with varying numbers of processes'''
+    print 'zipFiles: seconds per run, %d output zips' % n_zips
+    print '%10s %10s %12s' % ('files', 'processes', 'seconds')
+    path = tempfile.mkdtemp()
+    try:
+        for n_files in file_counts:
+            path_in = os.path.join(path, 'input%d' % n_files)
+            make_corpus(path_in, n_files)
+            cat = BenchmarkCat(path_in, os.path.join(path, 'temp'), os.path.join(path, 'out'),
+                               4 * n_zips, n_zips)
+            for n_processes in processes:
+                seconds = min(timeit.repeat(lambda: cat.main(streaming = True,
+                                                             processes = n_processes),
+                                            number = 1, repeat = 3))
+                print '%10d %10d %12.4f' % (n_files, n_processes, seconds)
+    finally:
+        shutil.rmtree(path)
+
+
+def benchmark_selective(n_files = 4000, every_nth = 10, processes = [1, 4]):
+    '''Runs using one in every_nth of n_files files, unzipping all or some of them'''
+    print 'main: seconds per run using %d of %d files' % (n_files // every_nth, n_files)
+    print '%22s %10s %12s' % ('mode', 'processes', 'seconds')
+    path = tempfile.mkdtemp()
+    try:
+        path_in = os.path.join(path, 'input')
+        make_corpus(path_in, n_files, n_lines = 200)
+        for n_processes in processes:
+            for mode, options in [('unzip all', {}), ('unzip selectively', {'selective': True}), 
+                                  ('stream', {'streaming': True})]:
+                cat = BenchmarkCat(path_in, os.path.join(path, 'temp'), os.path.join(path, 'out'),
+                                   16, 4, every_nth)
+                # Non-streaming runs stage files in ../<zip key>/, kept inside path
+                os.chdir(path_in)
+                seconds = min(timeit.repeat(lambda: cat.main(processes = n_processes, **options),
+                                            number = 1, repeat = 3))
+                print '%22s %10d %12.4f' % (mode, n_processes, seconds)
+    finally:
+        os.chdir(os.path.dirname(os.path.realpath(__file__)))
+        shutil.rmtree(path)
+
+
+def benchmark_incremental(n_files = 1600, n_zips = 16):
+    '''Streaming runs from scratch and incremental reruns after changing one input'''
+    print 'main: seconds per run, %d files in %d output zips' % (n_files, n_zips)
+    print '%32s %12s' % ('run', 'seconds')
+    path = tempfile.mkdtemp()
+    try:
+        path_in = os.path.join(path, 'input')
+        make_corpus(path_in, n_files)
+        def run(incremental):
+            cat = BenchmarkCat(path_in, os.path.join(path, 'temp'), os.path.join(path, 'out'),
+                               4 * n_zips, n_zips)
+            cat.main(streaming = True, incremental = incremental)
+        print '%32s %12.4f' % ('from scratch', min(timeit.repeat(lambda: run(False),
+                                                                 number = 1, repeat = 3)))
+        run(True)
+        print '%32s %12.4f' % ('incremental, no changes', min(timeit.repeat(lambda: run(True),
+                                                                            number = 1, repeat = 3)))
+        # Replaces docs/doc0.txt, as the last file of a name in a zip file is used
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with zipfile.ZipFile(os.path.join(path_in, 'input0.zip'), 'a') as zf:
+                zf.writestr('docs/doc0.txt', 'changed\r\n')
+        print '%32s %12.4f' % ('incremental, one input changed', timeit.timeit(lambda: run(True), 
+                                                                               number = 1))
+    finally:
+        shutil.rmtree(path)
+
+
+def benchmark_compression(n_files = 400, n_zips = 16):
+    '''Streaming runs writing n_files files into n_zips zips with each compression method'''
+    methods = [('stored', None), ('fast', None), ('deflate', None), ('deflate', 9), 
+               ('bzip2', None)]
+    if gencat_module.lzma is not None:
+        methods += [('lzma', 0), ('lzma', None)]
+    print 'main: throughput and output size, %d files in %d output zips' % (n_files, n_zips)
+    print '%14s %10s %12s %10s %10s' % ('compression', 'level', 'seconds', 'MB/s', 'MB')
+    path = tempfile.mkdtemp()
+    try:
+        path_in = os.path.join(path, 'input')
+        make_corpus(path_in, n_files)
+        for compression, level in methods:
+            cat = BenchmarkCat(path_in, os.path.join(path, 'temp'), os.path.join(path, 'out'),
+                               4 * n_zips, n_zips, compression = compression, 
+                               compression_level = level)
+            seconds = min(timeit.repeat(lambda: cat.main(streaming = True), number = 1, repeat = 3))
+            outzips = [os.path.join(path, 'out', 'zip%d.zip' % n) for n in range(n_zips)]
+            size_in = 0
+            for outzip in outzips:
+                with zipfile.ZipFile(outzip) as zf:
+                    size_in += sum(zinfo.file_size for zinfo in zf.infolist())
+            size_out = sum(os.path.getsize(outzip) for outzip in outzips)
+            print '%14s %10s %12.4f %10.1f %10.1f' % (compression, 'default' if level is None else level,
+                                                       seconds, size_in / seconds / 2 ** 20, 
+                                                       float(size_out) / 2 ** 20)
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    benchmark_zipFiles()
+    benchmark_selective()
+    benchmark_incremental()
+    benchmark_compression()
@@ -22,6 +22,13 @@ class MockCat(gencat):
         self.concat_dict['concat1'] = ('./test_data/file1.txt', ) + ('./test_data/file2.txt', )
 
 
+class MockZipCat(MockCat):
+
+    def makeConcatDict(self):
+        self.concat_dict = {}
+        self.concat_dict['concat1'] = tuple(sorted(self.zip_members.keys()))
+
+
 class test_main(unittest.TestCase):
     
     def setUp(self):
@@ -61,6 +68,58 @@ class test_main(unittest.TestCase):
                     '\n\nNEWFILE\nFILENAME: file2.txt\n\nTHIS IS TEST FILE 2.\n'
         self.assertEqual(text, test_text)
 
+    def test_streaming(self):
+        '''
+        Test that main produces the same output when streaming from zip files.
+        '''
+        with zipfile.ZipFile('./test_data/input.zip', 'w', zipfile.ZIP_DEFLATED, True) as zf:
+            zf.write('./test_data/file1.txt')
+            zf.write('./test_data/file2.txt')
+        testcat = MockZipCat('./test_data', './test_temp', './test_out')
+        testcat.main(streaming = True)
+        
+        self.assertFalse(os.path.isdir('./test_temp'))
+        with open('./test_out/concatDict.txt', 'rU') as f:
+            self.assertEqual(f.read(), 'concat1|test_data/file1.txt|test_data/file2.txt\n')
+        with zipfile.ZipFile('./test_out/zip1.zip', 'r') as zf:
+            text = zf.read('../zip1/concat1.txt')
+
+        test_text = '\nNEWFILE\nFILENAME: file1.txt\n\nTHIS IS TEST FILE 1.' + \
+                    '\n\nNEWFILE\nFILENAME: file2.txt\n\nTHIS IS TEST FILE 2.\n'
+        self.assertEqual(text, test_text)
+
+    def test_incremental(self):
+        '''
+        Test that incremental runs rebuild output only when its inputs change.
+        '''
+        with zipfile.ZipFile('./test_data/input.zip', 'w', zipfile.ZIP_DEFLATED, True) as zf:
+            zf.write('./test_data/file1.txt')
+            zf.write('./test_data/file2.txt')
+        testcat = MockZipCat('./test_data', './test_temp', './test_out')
+        testcat.main(incremental = True)
+        self.assertTrue(os.path.isfile('./test_out/manifest.json'))
+        
+        os.utime('./test_out/zip1.zip', (0, 0))
+        testcat = MockZipCat('./test_data', './test_temp', './test_out')
+        testcat.main(incremental = True, streaming = True)
+        self.assertEqual(os.path.getmtime('./test_out/zip1.zip'), 0)
+        
+        with zipfile.ZipFile('./test_data/input.zip', 'w', zipfile.ZIP_DEFLATED, True) as zf:
+            zf.write('./test_data/file1.txt')
+            zf.writestr('test_data/file2.txt', 'THIS IS TEST FILE 2, CHANGED.\n')
+        testcat = MockZipCat('./test_data', './test_temp', './test_out')
+        testcat.main(incremental = True)
+        self.assertNotEqual(os.path.getmtime('./test_out/zip1.zip'), 0)
+        with zipfile.ZipFile('./test_out/zip1.zip', 'r') as zf:
+            self.assertEqual(zf.namelist(), ['../zip1/concat1.txt'])
+            text = zf.read('../zip1/concat1.txt')
+        self.assertTrue(text.endswith('FILENAME: file2.txt\n\nTHIS IS TEST FILE 2, CHANGED.\n'))
+        
+        os.utime('./test_out/zip1.zip', (0, 0))
+        testcat = MockZipCat('./test_data', './test_temp', './test_out', compression = 'fast')
+        testcat.main(incremental = True)
+        self.assertNotEqual(os.path.getmtime('./test_out/zip1.zip'), 0)
+
     def tearDown(self):
         paths = ['./test_data', './test_out']
         for path in paths:
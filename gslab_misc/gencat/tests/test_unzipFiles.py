@@ -184,6 +184,33 @@ class test_unzipFiles(unittest.TestCase):
                 count = count + 1
             self.assertEqual(count, 2)
 
+    def test_selective(self):
+        '''
+        Test that only the requested files are unzipped, in parallel from two zip files.
+        '''
+        files = ['test1', 'test2', 'test3']
+        for f in files:
+            with open('test_data/%s_text.txt' % f, 'wb') as fi:
+                fi.write('%s\n%s' % (f, f))
+        with zipfile.ZipFile('test_data/test1_zip.zip', 'w', zipfile.ZIP_DEFLATED, True) as inzip:
+            inzip.write('test_data/test1_text.txt', 'docs/test1_text.txt')
+            inzip.write('test_data/test2_text.txt', 'docs/test2_text.txt')
+        with zipfile.ZipFile('test_data/test2_zip.zip', 'w', zipfile.ZIP_DEFLATED, True) as inzip:
+            inzip.write('test_data/test3_text.txt', 'other/test3_text.txt')
+
+        selectivecat = MockCat('./test_data', './test_temp', './out_temp')
+        selectivecat.indexZips()
+        self.assertEqual(sorted(selectivecat.zip_members.keys()), 
+                         ['test_temp/docs/test1_text.txt', 'test_temp/docs/test2_text.txt', 
+                          'test_temp/other/test3_text.txt'])
+        selectivecat.unzipFiles(['./test_temp/docs/test1_text.txt', './test_data/test2_text.txt',
+                                 './test_temp/other/test3_text.txt'], processes = 2)
+        
+        self.assertEqual(os.listdir('test_temp/docs'), ['test1_text.txt'])
+        self.assertEqual(os.listdir('test_temp/other'), ['test3_text.txt'])
+        with open('test_temp/other/test3_text.txt', 'rU') as fi:
+            self.assertEqual(fi.read(), 'test3\ntest3')
+
     def tearDown(self):
         paths = ['./test_data', './test_temp', './test_out']
         for path in paths:
@@ -1,13 +1,17 @@
 import unittest
 import os
 import shutil
+import struct
 import zipfile
+import zlib
+import bz2
 import sys
 
 # Ensure the script is run from its own directory 
 os.chdir(os.path.dirname(os.path.realpath(__file__)))
 
 sys.path.append('../../')
+import gencat as gencat_module
 from gencat import gencat
 
 
@@ -139,11 +143,123 @@ class test_zipFiles(unittest.TestCase):
         self.assertEqual(text1, '\nNEWFILE\nFILENAME: file1.txt\n\nTHIS IS A TEST FILE.\n')
         self.assertEqual(text2, '\nNEWFILE\nFILENAME: file2.txt\n\nTHIS IS A TEST FILE.\n')
     
+    def test_streaming(self):
+        '''
+        Test that streaming reads files from the input zip files and from disk, 
+        translates newlines as zipFiles does and writes nothing to path_temp.
+        '''
+        with zipfile.ZipFile('./test_data/input.zip', 'w', zipfile.ZIP_DEFLATED, True) as zf:
+            zf.writestr('dir/file3.txt', 'THIS IS A\r\nZIPPED FILE.\r')
+        testcat = MockCat('./test_data', './test_temp', './test_out')
+        testcat.indexZips()
+        testcat.zip_dict = {} 
+        testcat.zip_dict['zip1'] = ('concat1', )
+        testcat.concat_dict = {}
+        testcat.concat_dict['concat1'] = ('./test_temp/dir/file3.txt', ) + ('./test_data/file1.txt', )
+        
+        testcat.zipFiles(streaming = True)
+        
+        self.assertEqual(os.listdir('./test_temp'), [])
+        with zipfile.ZipFile('./test_out/zip1.zip', 'r') as zf:
+            self.assertEqual(zf.namelist(), ['../zip1/concat1.txt'])
+            text = zf.read('../zip1/concat1.txt')
+        
+        test_text = '\nNEWFILE\nFILENAME: file3.txt\n\nTHIS IS A\nZIPPED FILE.\n' + \
+                    '\nNEWFILE\nFILENAME: file1.txt\n\nTHIS IS A TEST FILE.\n'
+        self.assertEqual(text, test_text)
+    
+    def test_parallel(self):
+        '''
+        Test that zip files built in parallel match those built serially and that
+        errors in the worker processes are raised.
+        '''
+        testcat = MockCat('./test_data', './test_temp', './test_out')
+        testcat.zip_dict = {} 
+        testcat.zip_dict['zip1'] = ('concat1', )
+        testcat.zip_dict['zip2'] = ('concat2', ) + ('concat1', )
+        testcat.concat_dict = {}
+        testcat.concat_dict['concat1'] = ('./test_data/file1.txt', )
+        testcat.concat_dict['concat2'] = ('./test_data/file2.txt', ) + ('./test_data/file1.txt', )
+        
+        for streaming in [False, True]:
+            texts = []
+            for processes in [None, 2]:
+                for path in ['./test_temp', './test_out']:
+                    shutil.rmtree(path, ignore_errors = True)
+                    os.makedirs(path)
+                testcat.zipFiles(streaming, processes)
+                for zipname in ['zip1', 'zip2']:
+                    with zipfile.ZipFile('./test_out/%s.zip' % zipname, 'r') as zf:
+                        texts += [(processes, zipname, name, zf.read(name)) for name in zf.namelist()]
+            serial = [text[1:] for text in texts if text[0] is None]
+            parallel = [text[1:] for text in texts if text[0] == 2]
+            self.assertEqual(len(serial), 3)
+            self.assertEqual(serial, parallel)
+        
+        testcat.concat_dict['concat2'] = ('./test_data/file3.txt', )
+        with self.assertRaises(EnvironmentError):
+            testcat.zipFiles(streaming = True, processes = 2)
+    
+    def test_compression(self):
+        '''
+        Test that each compression method writes entries of its type that decompress 
+        to the concatenated text, and that unknown methods are rejected.
+        '''
+        methods = [('stored', None, zipfile.ZIP_STORED), ('deflate', 9, zipfile.ZIP_DEFLATED),
+                   ('fast', None, zipfile.ZIP_DEFLATED), ('bzip2', 1, gencat_module.ZIP_BZIP2)]
+        if gencat_module.lzma is not None:
+            methods.append(('lzma', None, gencat_module.ZIP_LZMA))
+        test_text = '\nNEWFILE\nFILENAME: file1.txt\n\nTHIS IS A TEST FILE.' + \
+                    '\n\nNEWFILE\nFILENAME: file2.txt\n\nTHIS IS A TEST FILE.\n'
+        for compression, level, compress_type in methods:
+            for streaming in [False, True]:
+                for path in ['./test_temp', './test_out']:
+                    shutil.rmtree(path, ignore_errors = True)
+                    os.makedirs(path)
+                testcat = MockCat('./test_data', './test_temp', './test_out', compression, level)
+                testcat.zip_dict = {'zip1': ('concat1', )}
+                testcat.concat_dict = {'concat1': ('./test_data/file1.txt', './test_data/file2.txt')}
+                
+                testcat.zipFiles(streaming)
+                
+                with zipfile.ZipFile('./test_out/zip1.zip', 'r') as zf:
+                    zinfo = zf.getinfo('../zip1/concat1.txt')
+                self.assertEqual(zinfo.compress_type, compress_type)
+                text = readEntry('./test_out/zip1.zip', zinfo)
+                self.assertEqual(text, test_text)
+                self.assertEqual(zlib.crc32(text) & 0xffffffff, zinfo.CRC)
+        
+        with self.assertRaises(ValueError):
+            MockCat('./test_data', './test_temp', './test_out', 'zstd')
+    
     def tearDown(self):
         paths = ['./test_data', './test_temp', './test_out']
         for path in paths:
             shutil.rmtree(path, ignore_errors = True)
 
 
+def readEntry(zippath, zinfo):
+    '''
+    Reads and decompresses the entry zinfo of a .zip file, including bzip2 and 
+    lzma entries, which Python 2's zipfile cannot read.
+    '''
+    with open(zippath, 'rb') as f:
+        f.seek(zinfo.header_offset)
+        header = struct.unpack(zipfile.structFileHeader, f.read(zipfile.sizeFileHeader))
+        f.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], 1)
+        data = f.read(zinfo.compress_size)
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(data, -15)
+    elif zinfo.compress_type == gencat_module.ZIP_BZIP2:
+        return bz2.decompress(data)
+    elif zinfo.compress_type == gencat_module.ZIP_LZMA:
+        lzma = gencat_module.lzma
+        props_size, = struct.unpack('<H', data[2:4])
+        lzma_filter = lzma._decode_filter_properties(lzma.FILTER_LZMA1, data[4:4 + props_size])
+        return lzma.LZMADecompressor(lzma.FORMAT_RAW, filters = [lzma_filter]).decompress(
+            data[4 + props_size:])
+    return data
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -51,13 +51,14 @@ class TableBuilder(GSLabBuilder):
     def do_call(self):
         '''
         '''
-        output = tablefill(input    = self.input_string, 
+        result = tablefill(input    = self.input_string, 
                            template = os.path.normpath(self.source_file), 
-                           output   = os.path.normpath(self.target_file))
+                           output   = os.path.normpath(self.target_file),
+                           return_result = True)
         with open(self.log_file, 'wb') as f:
-            f.write(output)
+            f.write(result.message)
             f.write('\n\n')
-        if 'traceback' in str.lower(output): # if tablefill.py returns an error   
+        if not result.success: # if tablefill.py returns an error   
             command = 'tablefill(input    = %s,\n' \
                       '          template = %s,\n' \
                       '          output   = %s)' \
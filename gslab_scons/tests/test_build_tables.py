@@ -13,6 +13,7 @@ sys.path.append('../..')
 import gslab_scons.builders.build_tables as gs
 from gslab_scons._exception_classes import BadExtensionError, ExecCallError
 from gslab_make.tests import nostderrout
+from gslab_fill.fill_result import FillResult
 
 
 class TestBuildTables(unittest.TestCase):
@@ -21,11 +22,11 @@ class TestBuildTables(unittest.TestCase):
         if not os.path.exists('./build/'):
             os.mkdir('./build/')
 
-    def table_fill_side_effect(self, input, template, output):
-        return ""
+    def table_fill_side_effect(self, input, template, output, return_result = False):
+        return FillResult(template, output, 'success', '')
 
-    def table_fill_side_effect_error(self, input, template, output):
-        return "traceback"
+    def table_fill_side_effect_error(self, input, template, output, return_result = False):
+        return FillResult(template, output, 'error', 'traceback')
 
     @mock.patch('gslab_scons.builders.build_tables.tablefill')
     def test_standard(self, mock_tablefill):